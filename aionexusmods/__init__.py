@@ -1,27 +1,56 @@
 __version__ = "0.6.0"
 
 __all__ = [
+    "CatalogCrawler",
     "Category",
     "ColourScheme",
+    "ContentIndex",
+    "ContentIndexEntry",
     "DownloadLink",
+    "DownloadStage",
+    "DownloadStore",
     "Endorsement",
     "EndorsementRef",
     "File",
     "FilesResult",
     "FileUpdate",
     "Game",
+    "HedgePolicy",
+    "LazyModel",
+    "Md5Cache",
+    "Md5Stage",
     "Message",
     "Mod",
+    "ModBundle",
+    "ModCache",
     "ModUpdate",
+    "ModUpdateTable",
     "ModUser",
     "NexusMods",
     "Status",
     "TrackedMod",
     "User",
+    "ZipExtractStage",
 ]
 
 from .nexusmods import NexusMods
 
+from .cache import Md5Cache, ModCache
+
+from .tables import ModUpdateTable
+
+from .pipeline import DownloadStage, Md5Stage, ZipExtractStage
+
+from .store import DownloadStore
+
+from .index import ContentIndex, ContentIndexEntry
+
+from .lazy import LazyModel
+
+from .hedging import HedgePolicy
+
+from .crawler import CatalogCrawler
+
 from .models import (
     Category,
     ColourScheme,
@@ -34,6 +63,7 @@ from .models import (
     Game,
     Message,
     Mod,
+    ModBundle,
     ModUpdate,
     ModUser,
     Status,
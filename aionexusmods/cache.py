@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+from os import PathLike
+from typing import Optional, Union
+
+__all__ = ["Md5Cache", "ModCache"]
+
+
+class Md5Cache:
+    """
+    Persistent on-disk cache for md5 search results.
+
+    The files matching a given md5 hash never change, so positive results are kept forever.
+    Hashes that matched nothing are remembered for `negative_ttl` seconds before being retried.
+    """
+
+    negative_ttl: float
+
+    def __init__(self, path: Union[str, PathLike[str]], negative_ttl: float = 60 * 60 * 24):
+        self.negative_ttl = negative_ttl
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS md5_search ("
+            " game_domain_name TEXT NOT NULL,"
+            " md5_hash TEXT NOT NULL,"
+            " result BLOB,"
+            " timestamp REAL NOT NULL,"
+            " PRIMARY KEY (game_domain_name, md5_hash)"
+            ")"
+        )
+        self._connection.commit()
+
+    def get(self, game_domain_name: str, md5_hash: str) -> tuple[bool, Optional[bytes]]:
+        """
+        Returns a `(hit, result)` pair for the given hash.
+        A hit with a `None` result means the hash is known not to match any files.
+        """
+        row = self._connection.execute(
+            "SELECT result, timestamp FROM md5_search WHERE game_domain_name = ? AND md5_hash = ?",
+            (game_domain_name, md5_hash.lower()),
+        ).fetchone()
+        if row is None:
+            return False, None
+        result, timestamp = row
+        if result is None and time.time() - timestamp > self.negative_ttl:
+            return False, None
+        return True, result
+
+    def set(self, game_domain_name: str, md5_hash: str, result: Optional[bytes]) -> None:
+        """
+        Stores the raw response for the given hash, or `None` to record that nothing matched.
+        """
+        self._connection.execute(
+            "INSERT OR REPLACE INTO md5_search VALUES (?, ?, ?, ?)",
+            (game_domain_name, md5_hash.lower(), result, time.time()),
+        )
+        self._connection.commit()
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+class ModCache:
+    """
+    Persistent on-disk cache for mod changelogs and file lists.
+
+    Entries are not expired by time, but by the mod itself: an entry is only used while the mod's `version`
+    and update timestamp are unchanged from when it was stored.
+    """
+
+    def __init__(self, path: Union[str, PathLike[str]]):
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS mod_cache ("
+            " game_domain_name TEXT NOT NULL,"
+            " endpoint TEXT NOT NULL,"
+            " mod_id INTEGER NOT NULL,"
+            " version TEXT,"
+            " updated_timestamp INTEGER NOT NULL,"
+            " result BLOB NOT NULL,"
+            " PRIMARY KEY (game_domain_name, endpoint, mod_id)"
+            ")"
+        )
+        self._connection.commit()
+
+    def get(
+        self,
+        game_domain_name: str,
+        endpoint: str,
+        mod_id: int,
+        version: Optional[str],
+        updated_timestamp: int,
+    ) -> Optional[bytes]:
+        """
+        Returns the stored response, or `None` if there is none or the mod has changed since it was stored.
+        A `None` version matches any version, for callers that only know the update timestamp.
+        """
+        row = self._connection.execute(
+            "SELECT version, updated_timestamp, result FROM mod_cache"
+            " WHERE game_domain_name = ? AND endpoint = ? AND mod_id = ?",
+            (game_domain_name, endpoint, mod_id),
+        ).fetchone()
+        if row is None:
+            return None
+        stored_version, stored_timestamp, result = row
+        if stored_timestamp < updated_timestamp:
+            return None
+        if version is not None and stored_version is not None and stored_version != version:
+            return None
+        return bytes(result)
+
+    def set(
+        self,
+        game_domain_name: str,
+        endpoint: str,
+        mod_id: int,
+        version: Optional[str],
+        updated_timestamp: int,
+        result: bytes,
+    ) -> None:
+        """
+        Stores the response for the given mod as of the given version and update timestamp.
+        """
+        self._connection.execute(
+            "INSERT OR REPLACE INTO mod_cache VALUES (?, ?, ?, ?, ?, ?)",
+            (game_domain_name, endpoint, mod_id, version, updated_timestamp, result),
+        )
+        self._connection.commit()
+
+    def close(self) -> None:
+        self._connection.close()
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+from os import PathLike
+from typing import TYPE_CHECKING, Awaitable, Callable, ClassVar, Iterator, Optional, Union
+
+from aiohttp import ClientConnectionError, ClientPayloadError, ClientResponseError
+
+from .models import Mod
+
+if TYPE_CHECKING:
+    from .nexusmods import NexusMods
+
+__all__ = ["CatalogCrawler"]
+
+
+class _Shard:
+    def __init__(self, start: int, stop: int, next_id: int):
+        self.start = start
+        self.stop = stop
+        self.next_id = next_id
+        self.done: set[int] = set()
+
+
+class CatalogCrawler:
+    """
+    Crawls every mod of a game by id, from 1 up to the newest added mod, passing available mods to `sink`.
+
+    The id range is split into shards of `shard_size` ids whose progress is checkpointed, so an interrupted crawl
+    resumes where it left off. Ids of deleted or unavailable mods are recorded as gaps, and are skipped by later
+    crawls. All `workers` share a single queue of ids, keeping the rate limiter saturated until the very end.
+    Requests that fail with a transient status, a connection error or a timeout are retried up to `retries` times.
+    """
+
+    GAP_STATUSES: ClassVar[frozenset[int]] = frozenset({403, 404, 410})
+    RETRY_STATUSES: ClassVar[frozenset[int]] = frozenset({429, 500, 502, 503, 504})
+    RETRY_ERRORS: ClassVar[tuple[type[Exception], ...]] = (
+        ClientConnectionError,
+        ClientPayloadError,
+        asyncio.TimeoutError,
+    )
+
+    workers: int
+    shard_size: int
+    retries: int
+
+    def __init__(
+        self,
+        nexusmods: NexusMods,
+        checkpoint_path: Union[str, PathLike[str]],
+        sink: Callable[[Mod], Awaitable[None]],
+        workers: int = 32,
+        shard_size: int = 1000,
+        retries: int = 3,
+    ):
+        self.workers = workers
+        self.shard_size = shard_size
+        self.retries = retries
+        self._nexusmods = nexusmods
+        self._sink = sink
+        self._connection = sqlite3.connect(checkpoint_path)
+        self._connection.executescript(
+            "CREATE TABLE IF NOT EXISTS shards ("
+            " start INTEGER PRIMARY KEY,"
+            " stop INTEGER NOT NULL,"
+            " next INTEGER NOT NULL"
+            ");"
+            "CREATE TABLE IF NOT EXISTS gaps ("
+            " mod_id INTEGER PRIMARY KEY,"
+            " reason TEXT NOT NULL"
+            ");"
+        )
+        self._connection.commit()
+
+    @property
+    def gaps(self) -> dict[int, str]:
+        """
+        Returns the ids that were found to be missing or unavailable, along with the reason.
+        """
+        return dict(self._connection.execute("SELECT mod_id, reason FROM gaps ORDER BY mod_id").fetchall())
+
+    async def run(self, stop: Optional[int] = None) -> None:
+        """
+        Crawls all ids below `stop`, defaulting to one past the newest added mod.
+        """
+        if stop is None:
+            stop = max((mod.mod_id for mod in await self._nexusmods.get_latest_added_mods()), default=0) + 1
+        self._add_shards(stop)
+
+        gaps = set(self.gaps)
+        shards = [
+            _Shard(*row)
+            for row in self._connection.execute("SELECT start, stop, next FROM shards WHERE next < stop ORDER BY start")
+        ]
+        ids = self._iter_ids(shards, gaps)
+
+        async def worker() -> None:
+            for shard, mod_id in ids:
+                await self._crawl(mod_id)
+                self._complete(shard, mod_id, gaps)
+
+        tasks = [asyncio.ensure_future(worker()) for _ in range(self.workers)]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._connection.commit()
+
+    def reset(self) -> None:
+        """
+        Resets shard progress so the next run crawls everything again, still skipping known gaps.
+        """
+        self._connection.execute("UPDATE shards SET next = start")
+        self._connection.commit()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _add_shards(self, stop: int) -> None:
+        for start in range(1, stop, self.shard_size):
+            shard_stop = min(start + self.shard_size, stop)
+            self._connection.execute("INSERT OR IGNORE INTO shards VALUES (?, ?, ?)", (start, shard_stop, start))
+            self._connection.execute(
+                "UPDATE shards SET stop = ? WHERE start = ? AND stop < ?", (shard_stop, start, shard_stop)
+            )
+        self._connection.commit()
+
+    def _iter_ids(self, shards: list[_Shard], gaps: set[int]) -> Iterator[tuple[_Shard, int]]:
+        for shard in shards:
+            for mod_id in range(shard.next_id, shard.stop):
+                if mod_id not in gaps:
+                    yield shard, mod_id
+
+    async def _crawl(self, mod_id: int) -> None:
+        for attempt in range(self.retries + 1):
+            try:
+                mod = await self._nexusmods.get_mod(mod_id)
+            except ClientResponseError as e:
+                if e.status in self.GAP_STATUSES:
+                    self._add_gap(mod_id, f"http {e.status}")
+                    return
+                if e.status not in self.RETRY_STATUSES or attempt == self.retries:
+                    raise
+                await asyncio.sleep(2**attempt)
+            except self.RETRY_ERRORS:
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(2**attempt)
+            else:
+                if mod.available:
+                    await self._sink(mod)
+                else:
+                    self._add_gap(mod_id, mod.status)
+                return
+
+    def _add_gap(self, mod_id: int, reason: str) -> None:
+        self._connection.execute("INSERT OR REPLACE INTO gaps VALUES (?, ?)", (mod_id, reason))
+
+    def _complete(self, shard: _Shard, mod_id: int, gaps: set[int]) -> None:
+        shard.done.add(mod_id)
+        next_id = shard.next_id
+        while next_id < shard.stop and (next_id in shard.done or next_id in gaps):
+            shard.done.discard(next_id)
+            next_id += 1
+        if next_id != shard.next_id:
+            shard.next_id = next_id
+            self._connection.execute("UPDATE shards SET next = ? WHERE start = ?", (next_id, shard.start))
+            self._connection.commit()
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import re
+from collections import deque
+from urllib.parse import urlsplit
+
+__all__ = ["HedgePolicy"]
+
+_ID = re.compile(r"(?<=/)(\d+|[0-9a-fA-F]{32})(?=[/.]|$)")
+_GAME = re.compile(r"(?<=/games/)[^/]+?(?=[/.]|$)")
+_NAME = re.compile(r"(?<=/)[^/]*[^A-Za-z_{}./][^/]*$")
+
+
+class HedgePolicy:
+    """
+    Policy for hedging idempotent GET requests.
+
+    When a request has not completed within the `percentile` latency of recent requests to the same endpoint,
+    a duplicate request is sent and whichever completes first is used.
+    Each request earns `budget` hedges, capped at `burst`, so hedges stay a small share of the rate limit.
+    Latencies are kept for at most `max_endpoints` endpoints, dropping the least recently used.
+    """
+
+    percentile: float
+    budget: float
+    burst: float
+    min_delay: float
+    default_delay: float
+    min_samples: int
+    max_endpoints: int
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        budget: float = 0.05,
+        burst: float = 10,
+        min_delay: float = 0.05,
+        default_delay: float = 2.0,
+        window: int = 200,
+        min_samples: int = 20,
+        max_endpoints: int = 256,
+    ):
+        self.percentile = percentile
+        self.budget = budget
+        self.burst = burst
+        self.min_delay = min_delay
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.max_endpoints = max_endpoints
+        self._window = window
+        self._latencies: dict[str, deque[float]] = {}
+        self._tokens = 0.0
+
+    @staticmethod
+    def endpoint(url: str) -> str:
+        """
+        Returns the endpoint of the given url: its host and route, with ids, hashes, game domain names
+        and file names (such as those of content previews) replaced by placeholders.
+        """
+        url_parts = urlsplit(url)
+        path = _NAME.sub("{name}", _GAME.sub("{game}", _ID.sub("{id}", url_parts.path)))
+        return f"{url_parts.netloc}{path}"
+
+    def delay(self, endpoint: str) -> float:
+        """
+        Returns how long to wait for a request to the given endpoint before hedging it.
+        """
+        latencies = self._latencies.get(endpoint)
+        if latencies is None or len(latencies) < self.min_samples:
+            return self.default_delay
+        ordered = sorted(latencies)
+        index = min(int(len(ordered) * self.percentile), len(ordered) - 1)
+        return max(ordered[index], self.min_delay)
+
+    def record(self, endpoint: str, latency: float) -> None:
+        """
+        Records the latency of a completed request to the given endpoint.
+        """
+        latencies = self._latencies.pop(endpoint, None)
+        if latencies is None:
+            latencies = deque(maxlen=self._window)
+            if len(self._latencies) >= self.max_endpoints:
+                del self._latencies[next(iter(self._latencies))]
+        self._latencies[endpoint] = latencies
+        latencies.append(latency)
+
+    def on_request(self) -> None:
+        """
+        Records that a request was sent, earning a fraction of a hedge.
+        """
+        self._tokens = min(self._tokens + self.budget, self.burst)
+
+    def try_hedge(self) -> bool:
+        """
+        Returns whether a hedge may be sent, consuming budget if so.
+        """
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+from os import PathLike
+from typing import TYPE_CHECKING, Iterable, Optional, Union
+
+from aiohttp import ClientResponseError
+from pydantic import BaseModel
+
+from .models import ContentPreview, File
+from .nexusmods import _gather
+
+if TYPE_CHECKING:
+    from .nexusmods import NexusMods
+
+__all__ = ["ContentIndex", "ContentIndexEntry"]
+
+
+class ContentIndexEntry(BaseModel):
+    path: str
+    name: str
+    mod_id: int
+    file_id: int
+    size: Optional[str]
+
+
+class ContentIndex:
+    """
+    Persistent inverted index from archive contents to the mod files that contain them, for a single game.
+
+    The index is built from content previews, so nothing needs to be downloaded.
+    Paths and names are normalized to lowercase with forward slashes.
+    """
+
+    def __init__(self, path: Union[str, PathLike[str]]):
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(
+            "CREATE TABLE IF NOT EXISTS meta ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL"
+            ");"
+            "CREATE TABLE IF NOT EXISTS files ("
+            " file_id INTEGER PRIMARY KEY,"
+            " mod_id INTEGER NOT NULL,"
+            " uploaded_timestamp INTEGER NOT NULL"
+            ");"
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " path TEXT NOT NULL,"
+            " name TEXT NOT NULL,"
+            " mod_id INTEGER NOT NULL,"
+            " file_id INTEGER NOT NULL,"
+            " size TEXT"
+            ");"
+            "CREATE INDEX IF NOT EXISTS files_mod_id ON files (mod_id);"
+            "CREATE INDEX IF NOT EXISTS entries_path ON entries (path);"
+            "CREATE INDEX IF NOT EXISTS entries_name ON entries (name);"
+            "CREATE INDEX IF NOT EXISTS entries_file_id ON entries (file_id);"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def normalize(path: str) -> str:
+        return path.replace("\\", "/").strip("/").lower()
+
+    async def update(self, nexusmods: NexusMods, mod_ids: Iterable[int], concurrency: int = 8) -> None:
+        """
+        Indexes the files of the given mods.
+        Only files that are new or have been re-uploaded have their content previews fetched,
+        and files that were removed from a mod are dropped from the index.
+        If a request fails, the remaining ones are cancelled before the error is raised.
+        """
+        self._check_game(nexusmods.game_domain_name)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def update_mod(mod_id: int) -> None:
+            async with semaphore:
+                files, _ = await nexusmods.get_files_and_updates(mod_id)
+            indexed = dict(
+                self._connection.execute(
+                    "SELECT file_id, uploaded_timestamp FROM files WHERE mod_id = ?", (mod_id,)
+                ).fetchall()
+            )
+            for file_id in indexed.keys() - {file.file_id for file in files}:
+                self._remove_file(file_id)
+            changed = [file for file in files if indexed.get(file.file_id) != file.uploaded_timestamp]
+            await _gather(*(update_file(mod_id, file) for file in changed))
+            self._connection.commit()
+
+        async def update_file(mod_id: int, file: File) -> None:
+            async with semaphore:
+                content_preview = await self._get_content_preview(nexusmods, file)
+            self._remove_file(file.file_id)
+            self._add_file(mod_id, file, content_preview)
+
+        await _gather(*map(update_mod, mod_ids))
+
+    def find(self, path: str) -> list[ContentIndexEntry]:
+        """
+        Returns the entries whose path is, or ends with, the given path.
+        """
+        path = self.normalize(path)
+        name = path.rpartition("/")[2]
+        return [
+            entry for entry in self._query("name = ?", name) if entry.path == path or entry.path.endswith("/" + path)
+        ]
+
+    def find_name(self, name: str) -> list[ContentIndexEntry]:
+        """
+        Returns the entries with the given file name.
+        """
+        return self._query("name = ?", self.normalize(name))
+
+    def find_prefix(self, prefix: str) -> list[ContentIndexEntry]:
+        """
+        Returns the entries whose path starts with the given prefix.
+        """
+        prefix = self.normalize(prefix)
+        return self._query("path >= ? AND path < ?", prefix, prefix + "\U0010ffff")
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _check_game(self, game_domain_name: str) -> None:
+        self._connection.execute("INSERT OR IGNORE INTO meta VALUES ('game_domain_name', ?)", (game_domain_name,))
+        (indexed_game,) = self._connection.execute("SELECT value FROM meta WHERE key = 'game_domain_name'").fetchone()
+        if indexed_game != game_domain_name:
+            raise ValueError(f"content index is for {indexed_game!r}, not {game_domain_name!r}")
+
+    @staticmethod
+    async def _get_content_preview(nexusmods: NexusMods, file: File) -> Optional[ContentPreview]:
+        try:
+            return await nexusmods.get_content_preview(file.content_preview_link)
+        except ClientResponseError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def _add_file(self, mod_id: int, file: File, content_preview: Optional[ContentPreview]) -> None:
+        self._connection.execute(
+            "INSERT INTO files VALUES (?, ?, ?)",
+            (file.file_id, mod_id, file.uploaded_timestamp),
+        )
+        if content_preview is None:
+            return
+        self._connection.executemany(
+            "INSERT INTO entries VALUES (?, ?, ?, ?, ?)",
+            (
+                (self.normalize(child.path), self.normalize(child.name), mod_id, file.file_id, child.size)
+                for child in content_preview.children_recursive()
+                if child.type == "file" and child.path and child.name
+            ),
+        )
+
+    def _remove_file(self, file_id: int) -> None:
+        self._connection.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+        self._connection.execute("DELETE FROM entries WHERE file_id = ?", (file_id,))
+
+    def _query(self, where: str, *args: str) -> list[ContentIndexEntry]:
+        rows = self._connection.execute(
+            f"SELECT path, name, mod_id, file_id, size FROM entries WHERE {where} ORDER BY path", args
+        )
+        return [
+            ContentIndexEntry(path=path, name=name, mod_id=mod_id, file_id=file_id, size=size)
+            for path, name, mod_id, file_id, size in rows
+        ]
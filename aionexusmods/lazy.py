@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import json
+from inspect import isclass
+from typing import TYPE_CHECKING, ClassVar, Optional, TypeVar, Union, cast, get_args, get_origin
+
+from pydantic import BaseModel, ValidationError, parse_obj_as
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON, ModelField
+from pydantic.main import ModelMetaclass
+
+if TYPE_CHECKING:
+    from pydantic.typing import AbstractSetIntStr, MappingIntStrAny, ReprArgs, TupleGenerator
+
+__all__ = ["LazyModel", "parse_raw_lazy"]
+
+_M = TypeVar("_M", bound=BaseModel)
+_T = TypeVar("_T")
+
+
+class LazyModel(BaseModel):
+    """
+    Base class of the lazy subclasses that `parse_raw_lazy` creates for each model, such as `LazyMod` for `Mod`.
+
+    Lazy models are real instances of their model that keep the raw decoded data and validate each field on first
+    access. Nested models are themselves lazy. Anything that reads the model as a whole, such as `dict()`, `json()`,
+    `copy()` or comparisons, validates the entire model first, as does `validate_all()`.
+    Lazy models are pickled as their fully validated model.
+    """
+
+    __slots__ = ("_raw",)
+
+    _model: ClassVar[type[BaseModel]]
+
+    def validate_all(self) -> None:
+        """
+        Validates the fields that have not been accessed yet, raising a `ValidationError` if any of them is invalid.
+        """
+        raw = _get_raw(self)
+        if raw is None:
+            return
+        validated = self._model.parse_obj(raw)
+        # updated in place, as pydantic may already hold a reference to __dict__
+        values = self.__dict__
+        merged = {name: values.get(name, value) for name, value in validated.__dict__.items()}
+        values.clear()
+        values.update(merged)
+        object.__setattr__(self, "__fields_set__", validated.__fields_set__)
+        object.__setattr__(self, "_raw", None)
+
+    def __getattr__(self, name: str) -> object:
+        # only called for fields that have not been accessed yet, and for __fields_set__ until all fields are
+        raw = _get_raw(self)
+        if raw is not None:
+            if name == "__fields_set__":
+                self.validate_all()
+                return self.__fields_set__
+            field = self.__fields__.get(name)
+            if field is not None:
+                value = self.__dict__[name] = _validate_field(self._model, field, raw.get(field.alias))
+                return value
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def _iter(
+        self,
+        to_dict: bool = False,
+        by_alias: bool = False,
+        include: Optional[Union[AbstractSetIntStr, MappingIntStrAny]] = None,
+        exclude: Optional[Union[AbstractSetIntStr, MappingIntStrAny]] = None,
+        exclude_unset: bool = False,
+        exclude_defaults: bool = False,
+        exclude_none: bool = False,
+    ) -> TupleGenerator:
+        self.validate_all()
+        return super()._iter(to_dict, by_alias, include, exclude, exclude_unset, exclude_defaults, exclude_none)
+
+    def __iter__(self) -> TupleGenerator:
+        self.validate_all()
+        return super().__iter__()
+
+    def __reduce__(self) -> Union[str, tuple[object, ...]]:
+        self.validate_all()
+        return self._model.construct, (), self.__getstate__()
+
+    def __repr_args__(self) -> ReprArgs:
+        # only the fields validated so far, so that repr never fails
+        return [(name, value) for name, value in self.__dict__.items() if self.__fields__[name].field_info.repr]
+
+
+_lazy_models: dict[type[BaseModel], type[LazyModel]] = {}
+
+
+def parse_raw_lazy(type_: type[_T], b: bytes) -> _T:
+    """
+    Like `pydantic.parse_raw_as`, but models and lists of models are returned as lazy models.
+    """
+    data = json.loads(b)
+    if _is_model(type_) and isinstance(data, dict):
+        return cast(_T, _lazy(cast(type[BaseModel], type_), data))
+    if get_origin(type_) is list and _is_model(get_args(type_)[0]) and isinstance(data, list):
+        return cast(_T, [_validate_item(get_args(type_)[0], item) for item in data])
+    return parse_obj_as(type_, data)
+
+
+def _lazy(model: type[_M], raw: dict[str, object]) -> _M:
+    lazy_model = _lazy_models.get(model)
+    if lazy_model is None:
+        namespace = {"__module__": __name__, "_model": model}
+        lazy_model = cast(type[LazyModel], ModelMetaclass(f"Lazy{model.__name__}", (LazyModel, model), namespace))
+        _lazy_models[model] = lazy_model
+    # __fields_set__ is left unset until the whole model is validated
+    instance = lazy_model.__new__(lazy_model)
+    object.__setattr__(instance, "__dict__", {})
+    object.__setattr__(instance, "_raw", raw)
+    return cast(_M, instance)
+
+
+def _get_raw(instance: LazyModel) -> Optional[dict[str, object]]:
+    # copies of lazy models are created without raw data, as they are always fully validated
+    try:
+        return cast(Optional[dict[str, object]], object.__getattribute__(instance, "_raw"))
+    except AttributeError:
+        return None
+
+
+def _is_model(type_: object) -> bool:
+    return isclass(type_) and issubclass(type_, BaseModel)
+
+
+def _validate_item(model: type[BaseModel], value: object) -> object:
+    return _lazy(model, value) if isinstance(value, dict) else parse_obj_as(model, value)
+
+
+def _validate_field(model: type[BaseModel], field: ModelField, value: object) -> object:
+    if _is_model(field.type_):
+        if field.shape == SHAPE_SINGLETON and isinstance(value, dict):
+            return _lazy(field.type_, value)
+        if field.shape == SHAPE_LIST and isinstance(value, list):
+            return [_validate_item(field.type_, item) for item in value]
+    value, errors = field.validate(value, {}, loc=field.alias, cls=model)
+    if errors:
+        raise ValidationError([errors], model)
+    return value
@@ -17,6 +17,7 @@ __all__ = [
     "Game",
     "Message",
     "Mod",
+    "ModBundle",
     "ModUpdate",
     "ModUser",
     "SearchResult",
@@ -195,3 +196,11 @@ class ContentPreview(BaseModel):
 
 
 ContentPreview.update_forward_refs()
+
+
+class ModBundle(BaseModel):
+    mod: Optional[Mod]
+    files: Optional[list[File]]
+    file_updates: Optional[list[FileUpdate]]
+    changelogs: Optional[dict[str, list[str]]]
+    content_preview: Optional[ContentPreview]
@@ -1,21 +1,31 @@
 from __future__ import annotations
 
+import asyncio
+import copy
 import platform
 from os import PathLike
-from typing import AsyncIterator, ClassVar, Optional, Union
+from typing import AsyncIterator, Awaitable, Callable, ClassVar, Collection, Iterable, Optional, TypeVar, Union
 
-from aiohttp import ClientSession, TCPConnector
+from aiohttp import ClientResponseError, ClientSession, TCPConnector
 from aiolimiter import AsyncLimiter
 from pydantic import parse_raw_as
 
 import aionexusmods
 
+from .cache import Md5Cache, ModCache
+from .hedging import HedgePolicy
+from .lazy import parse_raw_lazy
 from .models import *
+from .pipeline import DownloadStage, Md5Stage
+from .store import DownloadStore
+from .tables import ModUpdateTable
 
 __all__ = ["NexusMods"]
 
 _JsonDict = dict[str, Union[str, int]]
 
+_T = TypeVar("_T")
+
 
 class NexusMods:
     """
@@ -34,10 +44,31 @@ class NexusMods:
         platform.python_version(),
     )
 
-    game_domain_name: str
+    MOD_BUNDLE_INCLUDE: ClassVar[frozenset[str]] = frozenset({"mod", "files", "changelogs", "content_preview"})
 
-    def __init__(self, api_key: str, game_domain_name: str):
+    game_domain_name: str
+    md5_cache: Optional[Md5Cache]
+    mod_cache: Optional[ModCache]
+    download_store: Optional[DownloadStore]
+    lazy: bool
+    hedge_policy: Optional[HedgePolicy]
+
+    def __init__(
+        self,
+        api_key: str,
+        game_domain_name: str,
+        md5_cache: Optional[Md5Cache] = None,
+        mod_cache: Optional[ModCache] = None,
+        download_store: Optional[DownloadStore] = None,
+        lazy: bool = False,
+        hedge_policy: Optional[HedgePolicy] = None,
+    ):
         self.game_domain_name = game_domain_name
+        self.md5_cache = md5_cache
+        self.mod_cache = mod_cache
+        self.download_store = download_store
+        self.lazy = lazy
+        self.hedge_policy = hedge_policy
         self._api_key = api_key
         self._session = None
 
@@ -53,51 +84,92 @@ class NexusMods:
         """
         json: _JsonDict = {"period": period}
         result = await self._get(f"{self.BASE_URL}/games/{self.game_domain_name}/mods/updated.json", json=json)
-        return parse_raw_as(list[ModUpdate], result)
+        return self._parse(list[ModUpdate], result)
 
-    async def get_mod_changelogs(self, mod_id: int) -> dict[str, list[str]]:
+    async def get_mod_updates_table(self, period: str) -> ModUpdateTable:
+        """
+        Same as `get_mod_updates` but returns a compact columnar table, suited to keeping large feeds in memory.
+        """
+        json: _JsonDict = {"period": period}
+        result = await self._get(f"{self.BASE_URL}/games/{self.game_domain_name}/mods/updated.json", json=json)
+        return ModUpdateTable.parse_raw(result)
+
+    async def get_mod_changelogs(
+        self, mod_id: int, mod: Optional[Union[Mod, ModUpdate]] = None
+    ) -> dict[str, list[str]]:
         """
         Returns a list of changelogs for the specified mod.
+        If a `mod_cache` is configured and the current `Mod` or `ModUpdate` is given, the cached changelogs are
+        returned for as long as the mod is unchanged.
         """
-        result = await self._get(f"{self.BASE_URL}/games/{self.game_domain_name}/mods/{mod_id}/changelogs.json")
-        return parse_raw_as(dict[str, list[str]], result)
+        result = await self._get_versioned(
+            "changelogs", f"{self.BASE_URL}/games/{self.game_domain_name}/mods/{mod_id}/changelogs.json", mod_id, mod
+        )
+        return self._parse(dict[str, list[str]], result)
 
     async def get_latest_added_mods(self) -> list[Mod]:
         """
         Returns the 10 latest added mods.
         """
         result = await self._get(f"{self.BASE_URL}/games/{self.game_domain_name}/mods/latest_added.json")
-        return parse_raw_as(list[Mod], result)
+        return self._parse(list[Mod], result)
 
     async def get_latest_updated_mods(self) -> list[Mod]:
         """
         Returns the 10 latest updated mods.
         """
         result = await self._get(f"{self.BASE_URL}/games/{self.game_domain_name}/mods/latest_updated.json")
-        return parse_raw_as(list[Mod], result)
+        return self._parse(list[Mod], result)
 
     async def get_trending_mods(self) -> list[Mod]:
         """
         Returns 10 trending mods.
         """
         result = await self._get(f"{self.BASE_URL}/games/{self.game_domain_name}/mods/trending.json")
-        return parse_raw_as(list[Mod], result)
+        return self._parse(list[Mod], result)
 
     async def get_mod(self, mod_id: int) -> Mod:
         """
         Returns a specified mod. Cached for 5 minutes.
         """
         result = await self._get(f"{self.BASE_URL}/games/{self.game_domain_name}/mods/{mod_id}.json")
-        return parse_raw_as(Mod, result)
+        return self._parse(Mod, result)
 
     async def get_md5_search(self, md5_hash: str) -> list[tuple[Mod, File]]:
         """
-        Returns a list of mod files for the given MD5 file hash.
+        Returns a list of mod files for the given MD5 file hash, or an empty list if the hash is unknown.
+        If an `md5_cache` is configured it is checked first.
         """
-        result = await self._get(f"{self.BASE_URL}/games/{self.game_domain_name}/mods/md5_search/{md5_hash}.json")
-        parsed = parse_raw_as(list[SearchResult], result)
+        result: Optional[bytes]
+        if self.md5_cache is None:
+            result = await self._get_md5_search_uncached(md5_hash)
+        else:
+            hit, result = self.md5_cache.get(self.game_domain_name, md5_hash)
+            if not hit:
+                result = await self._get_md5_search_uncached(md5_hash)
+                self.md5_cache.set(self.game_domain_name, md5_hash, result)
+        if result is None:
+            return []
+        parsed = self._parse(list[SearchResult], result)
         return [(p.mod, p.file_details) for p in parsed]
 
+    async def get_md5_search_many(
+        self, md5_hashes: Iterable[str], concurrency: int = 16
+    ) -> dict[str, list[tuple[Mod, File]]]:
+        """
+        Returns the mod files for each of the given MD5 file hashes, keyed by lowercase hash.
+        Duplicate hashes are only searched once, at most `concurrency` at a time, and unknown hashes map to an empty list.
+        If a search fails, the remaining searches are cancelled before the error is raised.
+        """
+        unique = list(dict.fromkeys(md5_hash.lower() for md5_hash in md5_hashes))
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def search(md5_hash: str) -> list[tuple[Mod, File]]:
+            async with semaphore:
+                return await self.get_md5_search(md5_hash)
+
+        return dict(zip(unique, await _gather(*map(search, unique))))
+
     async def set_endorsed(self, mod_id: int, version: str, endorsed: bool) -> Status:
         """Endorse or unendorse a mod."""
         json: _JsonDict = {"version": version}
@@ -111,18 +183,24 @@ class NexusMods:
                 f"{self.BASE_URL}/games/{self.game_domain_name}/mods/{mod_id}/abstain.json",
                 json=json,
             )
-        return parse_raw_as(Status, result)
+        return self._parse(Status, result)
 
     #
     # Nexus Mods Public Api - Mod Files
     #
 
-    async def get_files_and_updates(self, mod_id: int) -> tuple[list[File], list[FileUpdate]]:
+    async def get_files_and_updates(
+        self, mod_id: int, mod: Optional[Union[Mod, ModUpdate]] = None
+    ) -> tuple[list[File], list[FileUpdate]]:
         """
         Returns a list of files for the specified mod.
+        If a `mod_cache` is configured and the current `Mod` or `ModUpdate` is given, the cached files are
+        returned for as long as the mod is unchanged.
         """
-        result = await self._get(f"{self.BASE_URL}/games/{self.game_domain_name}/mods/{mod_id}/files.json")
-        parsed = parse_raw_as(FilesResult, result)
+        result = await self._get_versioned(
+            "files", f"{self.BASE_URL}/games/{self.game_domain_name}/mods/{mod_id}/files.json", mod_id, mod
+        )
+        parsed = self._parse(FilesResult, result)
         return parsed.files, parsed.file_updates
 
     async def get_file(self, mod_id: int, file_id: int) -> File:
@@ -130,7 +208,44 @@ class NexusMods:
         Returns the specified file for the specified mod.
         """
         result = await self._get(f"{self.BASE_URL}/games/{self.game_domain_name}/mods/{mod_id}/files/{file_id}.json")
-        return parse_raw_as(File, result)
+        return self._parse(File, result)
+
+    async def get_mod_bundle(self, mod_id: int, include: Collection[str] = MOD_BUNDLE_INCLUDE) -> ModBundle:
+        """
+        Returns the mod, its files and updates, its changelogs and the content preview of its primary file.
+        Independent requests are issued concurrently, and the content preview is requested as soon as the files arrive.
+        If a request fails, the others are cancelled before the error is raised.
+        Use `include` to select a subset of "mod", "files", "changelogs" and "content_preview".
+        """
+        unknown = set(include) - self.MOD_BUNDLE_INCLUDE
+        if unknown:
+            raise ValueError(f"unknown mod bundle fields: {', '.join(sorted(unknown))}")
+
+        bundle = ModBundle()
+
+        async def fetch_mod() -> None:
+            bundle.mod = await self.get_mod(mod_id)
+
+        async def fetch_changelogs() -> None:
+            bundle.changelogs = await self.get_mod_changelogs(mod_id)
+
+        async def fetch_files() -> None:
+            bundle.files, bundle.file_updates = await self.get_files_and_updates(mod_id)
+            if "content_preview" in include:
+                primary_file = self._primary_file(bundle.files)
+                if primary_file is not None:
+                    bundle.content_preview = await self.get_content_preview(primary_file.content_preview_link)
+
+        tasks = []
+        if "mod" in include:
+            tasks.append(fetch_mod())
+        if "changelogs" in include:
+            tasks.append(fetch_changelogs())
+        if "files" in include or "content_preview" in include:
+            tasks.append(fetch_files())
+        await _gather(*tasks)
+
+        return bundle
 
     async def get_download_links(self, mod_id: int, file_id: int) -> list[DownloadLink]:
         """
@@ -139,7 +254,7 @@ class NexusMods:
         result = await self._get(
             f"{self.BASE_URL}/games/{self.game_domain_name}/mods/{mod_id}/files/{file_id}/download_link.json"
         )
-        return parse_raw_as(list[DownloadLink], result)
+        return self._parse(list[DownloadLink], result)
 
     #
     # Nexus Mods Public Api - Games
@@ -148,12 +263,52 @@ class NexusMods:
     async def get_games(self) -> list[Game]:
         """Returns a list of all games."""
         result = await self._get(f"{self.BASE_URL}/games.json")
-        return parse_raw_as(list[Game], result)
+        return self._parse(list[Game], result)
 
     async def get_game(self) -> Game:
         """Returns the specified game."""
         result = await self._get(f"{self.BASE_URL}/games/{self.game_domain_name}.json")
-        return parse_raw_as(Game, result)
+        return self._parse(Game, result)
+
+    def for_game(self, game_domain_name: str) -> NexusMods:
+        """
+        Returns a client for another game that shares this client's session and caches.
+        """
+        nexusmods = copy.copy(self)
+        nexusmods.game_domain_name = game_domain_name
+        return nexusmods
+
+    async def get_mod_updates_for_games(
+        self,
+        period: str,
+        game_domain_names: Optional[Iterable[str]] = None,
+        concurrency: int = 16,
+        on_error: Optional[Callable[[str, Exception], None]] = None,
+    ) -> AsyncIterator[tuple[str, ModUpdate]]:
+        """
+        Yields the mod updates for each of the given games (or all games), tagged with their game domain name.
+        Games are requested concurrently, at most `concurrency` at a time, and yielded in order of completion.
+        A game that fails does not stop the others: its error is passed to `on_error` with its game domain name,
+        or, without `on_error`, the first error is raised once every other game has been yielded.
+        """
+        async for item in self._fan_out(lambda n: n.get_mod_updates(period), game_domain_names, concurrency, on_error):
+            yield item
+
+    async def get_latest_updated_mods_for_games(
+        self,
+        game_domain_names: Optional[Iterable[str]] = None,
+        concurrency: int = 16,
+        on_error: Optional[Callable[[str, Exception], None]] = None,
+    ) -> AsyncIterator[tuple[str, Mod]]:
+        """
+        Yields the latest updated mods for each of the given games (or all games), tagged with their game domain name.
+        Games are requested concurrently, at most `concurrency` at a time, and yielded in order of completion.
+        Errors are handled per game, as in `get_mod_updates_for_games`.
+        """
+        async for item in self._fan_out(
+            lambda n: n.get_latest_updated_mods(), game_domain_names, concurrency, on_error
+        ):
+            yield item
 
     #
     # Nexus Mods Public Api - User
@@ -162,12 +317,12 @@ class NexusMods:
     async def get_user(self) -> User:
         """Returns the current user."""
         result = await self._get(f"{self.BASE_URL}/users/validate.json")
-        return parse_raw_as(User, result)
+        return self._parse(User, result)
 
     async def get_tracked_mods(self) -> list[TrackedMod]:
         """Returns all the mods being tracked by the current user."""
         result = await self._get(f"{self.BASE_URL}/user/tracked_mods.json")
-        return parse_raw_as(list[TrackedMod], result)
+        return self._parse(list[TrackedMod], result)
 
     async def set_tracked(self, mod_id: int, tracked: bool) -> Message:
         """Track or untrack a mod."""
@@ -176,12 +331,12 @@ class NexusMods:
             result = await self._post(f"{self.BASE_URL}/user/tracked_mods.json", json=json)
         else:
             result = await self._delete(f"{self.BASE_URL}/user/tracked_mods.json", json=json)
-        return parse_raw_as(Message, result)
+        return self._parse(Message, result)
 
     async def get_endorsements(self) -> list[Endorsement]:
         """Returns a list of all endorsements for the current user."""
         result = await self._get(f"{self.BASE_URL}/user/endorsements.json")
-        return parse_raw_as(list[Endorsement], result)
+        return self._parse(list[Endorsement], result)
 
     #
     # Nexus Mods Public Api - Colour Schemes
@@ -192,7 +347,7 @@ class NexusMods:
         Returns list of all colour schemes, including the primary, secondary and 'darker' colours.
         """
         result = await self._get(f"{self.BASE_URL}/colourschemes.json")
-        return parse_raw_as(list[ColourScheme], result)
+        return self._parse(list[ColourScheme], result)
 
     #
     # Nexus Mods Public Api - Extras
@@ -203,23 +358,37 @@ class NexusMods:
         Returns the results from the specified content preview link.
         """
         result = await self._get(content_preview_link)
-        return parse_raw_as(ContentPreview, result)
-
-    async def download(self, download_link: str, path: Union[str, PathLike[str]]) -> None:
+        return self._parse(ContentPreview, result)
+
+    async def download(
+        self,
+        download_link: str,
+        path: Union[str, PathLike[str]],
+        stages: Iterable[DownloadStage] = (),
+        file: Optional[File] = None,
+    ) -> None:
         """
         Downloads the contents from the specified download link to the specified path.
+        Each chunk is also passed through the given stages while the download is in progress.
+        If a `download_store` is configured and the `file` being downloaded is given, the contents are only
+        downloaded once into the store and then linked to the specified path. Downloads that do not match the
+        file's md5 hash raise a `ValueError`, are not stored, and abort the given stages.
         """
-        from os.path import dirname
-        from aiofiles.os import mkdir
-        from aiofiles import open
-
-        try:
-            await mkdir(dirname(path))
-        except (FileExistsError, FileNotFoundError):
-            pass
-        async with open(path, "wb") as f:
-            async for chunk in self._get_iter_chunks(download_link):
-                await f.write(chunk)
+        stages = tuple(stages)
+        if self.download_store is None or file is None:
+            await self._download(download_link, path, stages)
+            return
+
+        store = self.download_store
+        key = store.key(file)
+        async with store.lock(key):
+            if key not in store:
+                await self._download_to_store(download_link, file, key, store, stages)
+                stages = ()
+            await store.link(key, path)
+
+        if stages:
+            await self._feed_file(store.object_path(key), stages)
 
     #
     # Implementation Details
@@ -253,9 +422,46 @@ class NexusMods:
         await self._active_session().close()
 
     async def _get(self, url: str, json: Optional[_JsonDict] = None) -> bytes:
+        if self.hedge_policy is not None:
+            return await self._get_hedged(url, json, self.hedge_policy)
         async with self._limiter:
-            async with self._active_session().get(url, json=json) as response:
-                return await response.read()
+            return await self._get_unlimited(url, json)
+
+    async def _get_unlimited(self, url: str, json: Optional[_JsonDict] = None) -> bytes:
+        async with self._active_session().get(url, json=json) as response:
+            return await response.read()
+
+    async def _get_hedged(self, url: str, json: Optional[_JsonDict], policy: HedgePolicy) -> bytes:
+        async def hedge() -> bytes:
+            async with self._limiter:
+                return await self._get_unlimited(url, json)
+
+        endpoint = policy.endpoint(url)
+        loop = asyncio.get_running_loop()
+
+        # the hedge delay only starts once the primary request has cleared the rate limiter
+        async with self._limiter:
+            policy.on_request()
+            start = loop.time()
+            pending = {asyncio.ensure_future(self._get_unlimited(url, json))}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=policy.delay(endpoint))
+            if not done and policy.try_hedge():
+                pending.add(asyncio.ensure_future(hedge()))
+            errors = []
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        policy.record(endpoint, loop.time() - start)
+                        return task.result()
+                    errors.append(error)
+            raise errors[0]
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
 
     async def _post(self, url: str, json: Optional[_JsonDict] = None) -> bytes:
         async with self._limiter:
@@ -267,6 +473,153 @@ class NexusMods:
             async with self._active_session().delete(url, json=json) as response:
                 return await response.read()
 
+    def _parse(self, type_: type[_T], result: bytes) -> _T:
+        if self.lazy:
+            return parse_raw_lazy(type_, result)
+        return parse_raw_as(type_, result)
+
+    async def _fan_out(
+        self,
+        fetch: Callable[[NexusMods], Awaitable[list[_T]]],
+        game_domain_names: Optional[Iterable[str]],
+        concurrency: int,
+        on_error: Optional[Callable[[str, Exception], None]],
+    ) -> AsyncIterator[tuple[str, _T]]:
+        if game_domain_names is None:
+            game_domain_names = [game.domain_name for game in await self.get_games()]
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch_game(game_domain_name: str) -> tuple[str, Union[list[_T], Exception]]:
+            async with semaphore:
+                try:
+                    return game_domain_name, await fetch(self.for_game(game_domain_name))
+                except Exception as e:
+                    return game_domain_name, e
+
+        tasks = [asyncio.ensure_future(fetch_game(name)) for name in dict.fromkeys(game_domain_names)]
+        errors: list[Exception] = []
+        try:
+            for future in asyncio.as_completed(tasks):
+                game_domain_name, items = await future
+                if isinstance(items, Exception):
+                    if on_error is None:
+                        errors.append(items)
+                    else:
+                        on_error(game_domain_name, items)
+                    continue
+                for item in items:
+                    yield game_domain_name, item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if errors:
+            raise errors[0]
+
+    @staticmethod
+    def _primary_file(files: list[File]) -> Optional[File]:
+        for file in files:
+            if file.is_primary:
+                return file
+        main_files = [file for file in files if file.category_name == "MAIN"]
+        return max(main_files, key=lambda file: file.uploaded_timestamp, default=None)
+
+    async def _get_versioned(self, endpoint: str, url: str, mod_id: int, mod: Optional[Union[Mod, ModUpdate]]) -> bytes:
+        if self.mod_cache is None or mod is None:
+            return await self._get(url)
+        if mod.mod_id != mod_id:
+            raise ValueError(f"expected mod {mod_id}, got mod {mod.mod_id}")
+        version: Optional[str]
+        if isinstance(mod, ModUpdate):
+            version, updated_timestamp = None, max(mod.latest_file_update, mod.latest_mod_activity)
+        else:
+            version, updated_timestamp = mod.version, mod.updated_timestamp
+        result = self.mod_cache.get(self.game_domain_name, endpoint, mod_id, version, updated_timestamp)
+        if result is None:
+            result = await self._get(url)
+            self.mod_cache.set(self.game_domain_name, endpoint, mod_id, version, updated_timestamp, result)
+        return result
+
+    async def _get_md5_search_uncached(self, md5_hash: str) -> Optional[bytes]:
+        try:
+            result = await self._get(f"{self.BASE_URL}/games/{self.game_domain_name}/mods/md5_search/{md5_hash}.json")
+        except ClientResponseError as e:
+            if e.status == 404:
+                return None
+            raise
+        return None if result.strip() == b"[]" else result
+
+    async def _download(
+        self, download_link: str, path: Union[str, PathLike[str]], stages: tuple[DownloadStage, ...]
+    ) -> None:
+        from os.path import dirname
+        from aiofiles.os import mkdir
+        from aiofiles import open
+
+        try:
+            await mkdir(dirname(path))
+        except (FileExistsError, FileNotFoundError):
+            pass
+        closed = 0
+        try:
+            async with open(path, "wb") as f:
+                async for chunk in self._get_iter_chunks(download_link):
+                    await f.write(chunk)
+                    for stage in stages:
+                        await stage.feed(chunk)
+            for stage in stages:
+                await stage.close()
+                closed += 1
+        except BaseException:
+            await self._abort_stages(stages[closed:])
+            raise
+
+    async def _download_to_store(
+        self, download_link: str, file: File, key: str, store: DownloadStore, stages: tuple[DownloadStage, ...]
+    ) -> None:
+        from os import remove
+
+        temp_path = store.temp_path(key)
+        try:
+            # checked first, so that a mismatch aborts the other stages before they are closed
+            await self._download(download_link, temp_path, (Md5Stage(file.md5), *stages))
+        except BaseException:
+            try:
+                remove(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        store.add(key, temp_path)
+
+    async def _feed_file(self, path: Union[str, PathLike[str]], stages: tuple[DownloadStage, ...]) -> None:
+        from aiofiles import open
+
+        closed = 0
+        try:
+            async with open(path, "rb") as f:
+                while True:
+                    chunk = await f.read(1024 * 1024 * 12)  # 12 MB
+                    if chunk:
+                        for stage in stages:
+                            await stage.feed(chunk)
+                    else:
+                        break
+            for stage in stages:
+                await stage.close()
+                closed += 1
+        except BaseException:
+            await self._abort_stages(stages[closed:])
+            raise
+
+    @staticmethod
+    async def _abort_stages(stages: tuple[DownloadStage, ...]) -> None:
+        for stage in stages:
+            try:
+                await stage.abort()
+            except Exception:
+                pass
+
     async def _get_iter_chunks(self, url: str) -> AsyncIterator[bytes]:
         async with self._limiter:
             async with self._active_session().get(url) as response:
@@ -276,3 +629,14 @@ class NexusMods:
                         yield chunk
                     else:
                         break
+
+
+async def _gather(*aws: Awaitable[_T]) -> list[_T]:
+    # like asyncio.gather, but the remaining tasks are cancelled and awaited when one of them fails
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return list(await asyncio.gather(*tasks))
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,405 @@
+from __future__ import annotations
+
+import bz2
+import hashlib
+import lzma
+import ntpath
+import os
+import struct
+import zlib
+from os import PathLike
+from os.path import commonpath, dirname, isdir, join, realpath
+from typing import TYPE_CHECKING, Optional, Union
+from zipfile import BadZipFile
+
+if TYPE_CHECKING:
+    from aiofiles.threadpool.binary import AsyncBufferedIOBase
+
+__all__ = ["DownloadStage", "Md5Stage", "ZipExtractStage"]
+
+
+class DownloadStage:
+    """
+    Base class for stages that process a download while it is still in progress.
+    Each chunk is passed to `feed` in order as it arrives, and `close` is called once the download is complete.
+    If the download or any stage fails, `abort` is called instead of `close`.
+    """
+
+    async def feed(self, chunk: bytes) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def abort(self) -> None:
+        pass
+
+
+class Md5Stage(DownloadStage):
+    """
+    Computes the md5 hash of a download, for comparison against `File.md5`.
+    If an expected hash is given, `close` raises a `ValueError` when the download does not match it,
+    so placing this stage first aborts the stages after it.
+    """
+
+    md5: Optional[str]
+
+    def __init__(self, md5: Optional[str] = None) -> None:
+        self.md5 = md5
+        self._md5 = hashlib.md5()
+
+    async def feed(self, chunk: bytes) -> None:
+        self._md5.update(chunk)
+
+    async def close(self) -> None:
+        if self.md5 and self.hexdigest() != self.md5.lower():
+            raise ValueError(f"md5 mismatch: expected {self.md5}, got {self.hexdigest()}")
+
+    def hexdigest(self) -> str:
+        return self._md5.hexdigest()
+
+
+_LOCAL_FILE_HEADER = b"PK\x03\x04"
+_DATA_DESCRIPTOR = b"PK\x07\x08"
+_ARCHIVE_TRAILERS = (b"PK\x01\x02", b"PK\x05\x06", b"PK\x06\x06", b"PK\x06\x07")
+
+_HEADER_STRUCT = struct.Struct("<4sHHHHHIIIHH")
+
+_FLAG_ENCRYPTED = 0x1
+_FLAG_LZMA_EOS = 0x2
+_FLAG_DATA_DESCRIPTOR = 0x8
+_FLAG_UTF8 = 0x800
+
+_WINDOWS_ILLEGAL_NAME_CHARS = str.maketrans(':<>|"?*', "_______")
+
+_MAX_OUTPUT = 1024 * 1024 * 4  # 4 MB
+
+
+class ZipExtractStage(DownloadStage):
+    """
+    Incrementally extracts a zip archive into the specified directory as it is downloaded.
+
+    Entries are read from their local file headers, so extraction never requires the archive to be read again.
+    Stored, deflated, bzip2 and lzma compressed entries are supported, including those followed by data descriptors.
+    Entry names are sanitized like `zipfile` does, and entries that would land outside the directory are rejected.
+    Decompressed data is written in bounded pieces, so highly compressed entries do not inflate memory use.
+    If the download fails, every entry extracted so far is removed again.
+    """
+
+    directory: str
+    extracted: list[str]
+
+    def __init__(self, directory: Union[str, PathLike[str]]):
+        self.directory = str(directory)
+        self.extracted = []
+        self._buffer = bytearray()
+        self._state = "header"
+        self._flags = 0
+        self._crc = 0
+        self._expected_crc = 0
+        self._zip64 = False
+        self._remaining = 0
+        self._written = 0
+        self._decompressor: Optional[Union[_DeflateDecompressor, bz2.BZ2Decompressor, _LZMADecompressor]] = None
+        self._file: Optional[AsyncBufferedIOBase] = None
+
+    async def feed(self, chunk: bytes) -> None:
+        self._buffer += chunk
+        while await self._step():
+            pass
+
+    async def close(self) -> None:
+        if self._state != "done" and (self._state != "header" or self._buffer):
+            await self._close_file()
+            raise BadZipFile("archive ended unexpectedly")
+
+    async def abort(self) -> None:
+        await self._close_file()
+        for path in reversed(self.extracted):
+            try:
+                if isdir(path):
+                    os.rmdir(path)
+                else:
+                    os.remove(path)
+            except OSError:
+                pass
+            # also remove the parent directories that are now empty
+            parent = dirname(path)
+            while len(parent) > len(self.directory):
+                try:
+                    os.rmdir(parent)
+                except OSError:
+                    break
+                parent = dirname(parent)
+        self.extracted.clear()
+
+    async def _step(self) -> bool:
+        if self._state == "header":
+            return await self._read_header()
+        if self._state == "data":
+            return await self._read_data()
+        if self._state == "descriptor":
+            return self._read_descriptor()
+        self._buffer.clear()
+        return False
+
+    async def _read_header(self) -> bool:
+        buffer = self._buffer
+        if len(buffer) < 4:
+            return False
+        if buffer[:4] in _ARCHIVE_TRAILERS:
+            self._state = "done"
+            return True
+        if buffer[:4] != _LOCAL_FILE_HEADER:
+            raise BadZipFile("bad local file header")
+        if len(buffer) < _HEADER_STRUCT.size:
+            return False
+
+        _, _, flags, method, _, _, crc, csize, usize, name_len, extra_len = _HEADER_STRUCT.unpack_from(buffer)
+        end = _HEADER_STRUCT.size + name_len + extra_len
+        if len(buffer) < end:
+            return False
+
+        raw_name = bytes(buffer[_HEADER_STRUCT.size : _HEADER_STRUCT.size + name_len])
+        extra = bytes(buffer[_HEADER_STRUCT.size + name_len : end])
+        del buffer[:end]
+
+        if flags & _FLAG_ENCRYPTED:
+            raise BadZipFile("encrypted zip entries are not supported")
+
+        self._zip64 = False
+        for field_id, field in _iter_extra_fields(extra):
+            if field_id == 0x0001:
+                self._zip64 = True
+                if csize == 0xFFFFFFFF:
+                    # zip64 fields are only present for the sizes that overflowed, uncompressed size first
+                    offset = 8 if usize == 0xFFFFFFFF else 0
+                    (csize,) = struct.unpack_from("<Q", field, offset)
+
+        if method == 0:
+            self._decompressor = None
+        elif method == 8:
+            self._decompressor = _DeflateDecompressor()
+        elif method == 12:
+            self._decompressor = bz2.BZ2Decompressor()
+        elif method == 14:
+            if flags & _FLAG_DATA_DESCRIPTOR and not flags & _FLAG_LZMA_EOS:
+                raise BadZipFile("lzma zip entries of unknown size without an end marker are not supported")
+            self._decompressor = _LZMADecompressor(None if flags & _FLAG_DATA_DESCRIPTOR else csize)
+        else:
+            raise BadZipFile(f"zip compression method {method} is not supported")
+
+        self._flags = flags
+        self._crc = 0
+        self._expected_crc = crc
+        self._remaining = csize
+        self._written = 0
+        self._state = "data"
+
+        name = raw_name.decode("utf-8" if flags & _FLAG_UTF8 else "cp437")
+        await self._open_file(name)
+        return True
+
+    async def _read_data(self) -> bool:
+        buffer = self._buffer
+        if self._decompressor is None and self._flags & _FLAG_DATA_DESCRIPTOR:
+            return await self._read_data_until_descriptor()
+        if self._decompressor is None:
+            size = min(self._remaining, len(buffer))
+            data = bytes(buffer[:size])
+            del buffer[:size]
+            self._remaining -= size
+            await self._write(data)
+            if self._remaining == 0:
+                await self._finish_entry()
+                return True
+            return size > 0
+
+        if not buffer:
+            return False
+        data = bytes(buffer)
+        buffer.clear()
+        decompressor = self._decompressor
+        while True:
+            await self._write(decompressor.decompress(data, _MAX_OUTPUT))
+            data = b""
+            if decompressor.eof:
+                buffer += decompressor.unused_data
+                await self._finish_entry()
+                return True
+            if decompressor.needs_input:
+                return True
+
+    async def _read_data_until_descriptor(self) -> bool:
+        # Stored entries of unknown size end at the first data descriptor whose crc and size match the data before it.
+        buffer = self._buffer
+        descriptor_size = 24 if self._zip64 else 16
+        i = buffer.find(_DATA_DESCRIPTOR)
+        while i != -1:
+            if len(buffer) < i + descriptor_size:
+                break
+            crc, size = struct.unpack_from("<IQ" if self._zip64 else "<II", buffer, i + 4)
+            if size == self._written + i and crc == zlib.crc32(buffer[:i], self._crc):
+                data = bytes(buffer[:i])
+                del buffer[:i]
+                await self._write(data)
+                await self._finish_entry()
+                return True
+            i = buffer.find(_DATA_DESCRIPTOR, i + 1)
+        # hold back anything that could be the start of a descriptor
+        end = len(buffer) - len(_DATA_DESCRIPTOR) + 1 if i == -1 else i
+        if end <= 0:
+            return False
+        data = bytes(buffer[:end])
+        del buffer[:end]
+        await self._write(data)
+        return False
+
+    def _read_descriptor(self) -> bool:
+        buffer = self._buffer
+        if len(buffer) < 4:
+            return False
+        offset = 4 if buffer[:4] == _DATA_DESCRIPTOR else 0
+        size = offset + (20 if self._zip64 else 12)
+        if len(buffer) < size:
+            return False
+        (self._expected_crc,) = struct.unpack_from("<I", buffer, offset)
+        del buffer[:size]
+        self._check_crc()
+        self._state = "header"
+        return True
+
+    async def _finish_entry(self) -> None:
+        await self._close_file()
+        if self._flags & _FLAG_DATA_DESCRIPTOR:
+            self._state = "descriptor"
+        else:
+            self._check_crc()
+            self._state = "header"
+
+    def _check_crc(self) -> None:
+        if self._crc != self._expected_crc:
+            raise BadZipFile(f"bad crc-32 for file {self.extracted[-1]!r}")
+
+    async def _open_file(self, name: str) -> None:
+        from aiofiles import open
+        from aiofiles.os import makedirs
+
+        # same as zipfile: drop drive letters and empty, current and parent parts
+        parts = [
+            part for part in ntpath.splitdrive(name.replace("\\", "/"))[1].split("/") if part not in ("", ".", "..")
+        ]
+        if os.sep == "\\":
+            parts = [part.translate(_WINDOWS_ILLEGAL_NAME_CHARS).rstrip(".") for part in parts]
+            parts = [part for part in parts if part]
+        if not parts:
+            raise BadZipFile(f"bad zip entry name {name!r}")
+        path = join(self.directory, *parts)
+        directory = realpath(self.directory)
+        if commonpath([directory, realpath(path)]) != directory:
+            raise BadZipFile(f"zip entry {name!r} is outside of the extraction directory")
+        self.extracted.append(path)
+
+        if name.endswith(("/", "\\")):
+            await makedirs(path, exist_ok=True)
+        else:
+            await makedirs(join(self.directory, *parts[:-1]), exist_ok=True)
+            self._file = await open(path, "wb")
+
+    async def _write(self, data: bytes) -> None:
+        self._crc = zlib.crc32(data, self._crc)
+        self._written += len(data)
+        if self._file is not None:
+            await self._file.write(data)
+
+    async def _close_file(self) -> None:
+        if self._file is not None:
+            await self._file.close()
+            self._file = None
+
+
+def _iter_extra_fields(extra: bytes) -> list[tuple[int, bytes]]:
+    fields = []
+    i = 0
+    while i + 4 <= len(extra):
+        field_id, size = struct.unpack_from("<HH", extra, i)
+        fields.append((field_id, extra[i + 4 : i + 4 + size]))
+        i += 4 + size
+    return fields
+
+
+class _DeflateDecompressor:
+    # zlib decompressor with the interface of the bz2 and lzma ones, keeping input it could not consume yet
+
+    def __init__(self) -> None:
+        self.needs_input = True
+        self._decompressor = zlib.decompressobj(-15)
+        self._tail = b""
+
+    @property
+    def eof(self) -> bool:
+        return self._decompressor.eof
+
+    @property
+    def unused_data(self) -> bytes:
+        return self._decompressor.unused_data
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        result = self._decompressor.decompress(self._tail + data, max_length)
+        self._tail = self._decompressor.unconsumed_tail
+        self.needs_input = not self._tail and len(result) < max_length
+        return result
+
+
+class _LZMADecompressor:
+    # Zip lzma entries start with a version and the lzma properties, followed by a raw lzma stream.
+    # The stream only has an end marker if the entry flags say so, otherwise the compressed size marks its end.
+
+    eof: bool
+    unused_data: bytes
+
+    def __init__(self, size: Optional[int]):
+        self.eof = False
+        self.unused_data = b""
+        self._size = size
+        self._consumed = 0
+        self._header = b""
+        self._decompressor: Optional[lzma.LZMADecompressor] = None
+
+    @property
+    def needs_input(self) -> bool:
+        return self._decompressor is None or self._decompressor.needs_input
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        if self._size is not None and data:
+            remaining = self._size - self._consumed
+            data, unused_data = data[:remaining], data[remaining:]
+            self.unused_data += unused_data
+            self._consumed += len(data)
+
+        if self._decompressor is None:
+            self._header += data
+            if len(self._header) < 4:
+                return b""
+            (properties_size,) = struct.unpack_from("<H", self._header, 2)
+            if len(self._header) < 4 + properties_size:
+                return b""
+            properties, data = self._header[4 : 4 + properties_size], self._header[4 + properties_size :]
+            self._decompressor = lzma.LZMADecompressor(lzma.FORMAT_RAW, filters=[_lzma1_filter(properties)])
+
+        result = self._decompressor.decompress(data, max_length)
+        if self._decompressor.eof:
+            self.eof = True
+            self.unused_data = self._decompressor.unused_data + self.unused_data
+        elif self._size is not None and self._consumed == self._size and self._decompressor.needs_input:
+            self.eof = True
+        return result
+
+
+def _lzma1_filter(properties: bytes) -> dict[str, int]:
+    if len(properties) < 5:
+        raise BadZipFile("bad lzma properties")
+    (dict_size,) = struct.unpack_from("<I", properties, 1)
+    pb, remainder = divmod(properties[0], 45)
+    lp, lc = divmod(remainder, 9)
+    return {"id": lzma.FILTER_LZMA1, "dict_size": dict_size, "lc": lc, "lp": lp, "pb": pb}
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import shutil
+import sqlite3
+import time
+from os import PathLike
+from os.path import abspath, dirname, exists, join
+from typing import Union
+
+from .models import File
+
+__all__ = ["DownloadStore"]
+
+
+class DownloadStore:
+    """
+    Content-addressed local store for downloaded files.
+
+    Each file is downloaded into the store once, keyed by its md5 hash (or its file id when no hash is known),
+    and then hardlinked to every requested path, falling back to a copy across devices.
+    Linked paths are reference counted, and unreferenced files are evicted in least recently used order
+    whenever the store grows beyond `max_size` bytes.
+    """
+
+    directory: str
+    max_size: int
+
+    def __init__(self, directory: Union[str, PathLike[str]], max_size: int):
+        self.directory = abspath(directory)
+        self.max_size = max_size
+        self._locks: dict[str, asyncio.Lock] = {}
+        os.makedirs(join(self.directory, "objects"), exist_ok=True)
+        self._connection = sqlite3.connect(join(self.directory, "store.sqlite"))
+        self._connection.executescript(
+            "CREATE TABLE IF NOT EXISTS objects ("
+            " key TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL"
+            ");"
+            "CREATE TABLE IF NOT EXISTS refs ("
+            " path TEXT PRIMARY KEY,"
+            " key TEXT NOT NULL REFERENCES objects (key)"
+            ");"
+            "CREATE INDEX IF NOT EXISTS refs_key ON refs (key);"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def key(file: File) -> str:
+        """
+        Returns the store key for the given file.
+        """
+        if file.md5:
+            return f"md5-{file.md5.lower()}"
+        file_id, game_id = file.id
+        return f"file-{game_id}-{file_id}"
+
+    def lock(self, key: str) -> asyncio.Lock:
+        """
+        Returns the lock that serializes downloads of the given key.
+        """
+        return self._locks.setdefault(key, asyncio.Lock())
+
+    def object_path(self, key: str) -> str:
+        return join(self.directory, "objects", key)
+
+    def temp_path(self, key: str) -> str:
+        return join(self.directory, "objects", f"{key}.part")
+
+    def __contains__(self, key: str) -> bool:
+        row = self._connection.execute("SELECT 1 FROM objects WHERE key = ?", (key,)).fetchone()
+        return row is not None and exists(self.object_path(key))
+
+    @property
+    def size(self) -> int:
+        """
+        Returns the total size in bytes of all stored files.
+        """
+        (size,) = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()
+        return int(size)
+
+    def refcount(self, key: str) -> int:
+        (count,) = self._connection.execute("SELECT COUNT(*) FROM refs WHERE key = ?", (key,)).fetchone()
+        return int(count)
+
+    def add(self, key: str, path: Union[str, PathLike[str]]) -> None:
+        """
+        Moves the file at the given path into the store under the given key.
+        """
+        object_path = self.object_path(key)
+        os.replace(path, object_path)
+        self._connection.execute(
+            "INSERT OR REPLACE INTO objects VALUES (?, ?, ?)",
+            (key, os.stat(object_path).st_size, time.time()),
+        )
+        self._connection.commit()
+
+    async def link(self, key: str, path: Union[str, PathLike[str]]) -> None:
+        """
+        Links the stored file for the given key to the given path, replacing any existing file.
+        The file is linked, or copied across devices, in the default executor so the event loop is not blocked.
+        """
+        path = abspath(path)
+        await asyncio.get_running_loop().run_in_executor(None, self._link_file, self.object_path(key), path)
+        self._connection.execute("INSERT OR REPLACE INTO refs VALUES (?, ?)", (path, key))
+        self._connection.execute("UPDATE objects SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._connection.commit()
+        self.evict()
+
+    def release(self, path: Union[str, PathLike[str]]) -> None:
+        """
+        Removes a path previously linked from the store, dropping its reference.
+        """
+        path = abspath(path)
+        if exists(path):
+            os.remove(path)
+        self._connection.execute("DELETE FROM refs WHERE path = ?", (path,))
+        self._connection.commit()
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Deletes unreferenced files, least recently used first, until the store fits within `max_size`.
+        Paths that were deleted without being released no longer count as references.
+        """
+        size = self.size
+        if size <= self.max_size:
+            return
+        rows = self._connection.execute("SELECT key, size FROM objects ORDER BY last_used").fetchall()
+        for key, object_size in rows:
+            if size <= self.max_size:
+                break
+            paths = self._connection.execute("SELECT path FROM refs WHERE key = ?", (key,)).fetchall()
+            stale = [(path,) for (path,) in paths if not exists(path)]
+            self._connection.executemany("DELETE FROM refs WHERE path = ?", stale)
+            if len(stale) < len(paths):
+                continue
+            try:
+                os.remove(self.object_path(key))
+            except FileNotFoundError:
+                pass
+            self._connection.execute("DELETE FROM objects WHERE key = ?", (key,))
+            size -= object_size
+        self._connection.commit()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    @staticmethod
+    def _link_file(object_path: str, path: str) -> None:
+        os.makedirs(dirname(path), exist_ok=True)
+        if exists(path):
+            os.remove(path)
+        try:
+            os.link(object_path, path)
+        except OSError:
+            shutil.copyfile(object_path, path)
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import json
+from array import array
+from bisect import bisect_left
+from typing import Iterator, Optional
+
+from .models import ModUpdate
+
+__all__ = ["ModUpdateTable"]
+
+
+class ModUpdateTable:
+    """
+    Compact columnar representation of a mod updates feed.
+
+    Rows are stored as three parallel `array('q')` columns sorted by mod_id, which doubles as the index for lookups.
+    """
+
+    mod_ids: array[int]
+    latest_file_updates: array[int]
+    latest_mod_activities: array[int]
+
+    def __init__(self, mod_ids: array[int], latest_file_updates: array[int], latest_mod_activities: array[int]):
+        if not (len(mod_ids) == len(latest_file_updates) == len(latest_mod_activities)):
+            raise ValueError("columns must have the same length")
+        order = sorted(range(len(mod_ids)), key=mod_ids.__getitem__)
+        self.mod_ids = array("q", [mod_ids[i] for i in order])
+        self.latest_file_updates = array("q", [latest_file_updates[i] for i in order])
+        self.latest_mod_activities = array("q", [latest_mod_activities[i] for i in order])
+
+    @classmethod
+    def parse_raw(cls, b: bytes) -> ModUpdateTable:
+        """
+        Builds a table from the raw response of the mod updates endpoint.
+        """
+        rows = json.loads(b)
+        return cls(
+            array("q", [row["mod_id"] for row in rows]),
+            array("q", [row["latest_file_update"] for row in rows]),
+            array("q", [row["latest_mod_activity"] for row in rows]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.mod_ids)
+
+    def __iter__(self) -> Iterator[ModUpdate]:
+        for i in range(len(self)):
+            yield self._row(i)
+
+    def __contains__(self, mod_id: int) -> bool:
+        return self._index(mod_id) is not None
+
+    def get(self, mod_id: int) -> Optional[ModUpdate]:
+        """
+        Returns the row for the given mod, or `None` if it is not in the feed.
+        """
+        i = self._index(mod_id)
+        return None if i is None else self._row(i)
+
+    def changed_since(self, timestamp: int) -> array[int]:
+        """
+        Returns the ids of mods whose files or activity were updated after the given timestamp.
+        """
+        return array(
+            "q",
+            [
+                mod_id
+                for mod_id, file_update, mod_activity in zip(
+                    self.mod_ids, self.latest_file_updates, self.latest_mod_activities
+                )
+                if file_update > timestamp or mod_activity > timestamp
+            ],
+        )
+
+    def diff(self, other: ModUpdateTable) -> tuple[array[int], array[int], array[int]]:
+        """
+        Compares this feed against a newer one in linear time.
+        Returns the ids of mods that were added, removed, and changed.
+        """
+        added, removed, changed = array("q"), array("q"), array("q")
+        i, j, n, m = 0, 0, len(self), len(other)
+        while i < n and j < m:
+            a, b = self.mod_ids[i], other.mod_ids[j]
+            if a < b:
+                removed.append(a)
+                i += 1
+            elif a > b:
+                added.append(b)
+                j += 1
+            else:
+                if (
+                    self.latest_file_updates[i] != other.latest_file_updates[j]
+                    or self.latest_mod_activities[i] != other.latest_mod_activities[j]
+                ):
+                    changed.append(a)
+                i += 1
+                j += 1
+        removed.extend(self.mod_ids[i:])
+        added.extend(other.mod_ids[j:])
+        return added, removed, changed
+
+    def _index(self, mod_id: int) -> Optional[int]:
+        i = bisect_left(self.mod_ids, mod_id)
+        if i < len(self.mod_ids) and self.mod_ids[i] == mod_id:
+            return i
+        return None
+
+    def _row(self, i: int) -> ModUpdate:
+        return ModUpdate(
+            mod_id=self.mod_ids[i],
+            latest_file_update=self.latest_file_updates[i],
+            latest_mod_activity=self.latest_mod_activities[i],
+        )
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from aiohttp import ClientResponseError
+from aionexusmods import NexusMods
+from aionexusmods.models import ContentPreview
+from aioresponses import aioresponses
+
+from .mock_data import *
+
+MOCK_PRIMARY_FILE = MOCK_FILE.copy(update={"is_primary": True})
+
+MOCK_CONTENT_PREVIEW = ContentPreview(
+    path=None,
+    name="Nexus Mods API Test-49565-0-1-0-1618582484.zip",
+    type="directory",
+    children=[ContentPreview(path="readme.txt", name="readme.txt", type="file", size="1 kB")],
+)
+
+
+@pytest.mark.asyncio
+async def test_mod_bundle(mock_responses):  # type: ignore
+    async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME) as nexusmods:
+        bundle = await nexusmods.get_mod_bundle(MOCK_MOD_ID)
+        assert bundle.mod == MOCK_MOD
+        assert bundle.files == [MOCK_FILE]
+        assert bundle.file_updates == [MOCK_FILE_UPDATE]
+        assert bundle.changelogs == MOCK_CHANGELOGS
+        assert bundle.content_preview is None
+
+
+@pytest.mark.asyncio
+async def test_mod_bundle_content_preview():  # type: ignore
+    with aioresponses() as mock:
+        mock.get(
+            f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}/mods/{MOCK_MOD_ID}/files.json",
+            payload=FilesResult(files=[MOCK_PRIMARY_FILE], file_updates=[]).dict(),
+        )
+        mock.get(MOCK_FILE.content_preview_link, payload=MOCK_CONTENT_PREVIEW.dict())
+        async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME) as nexusmods:
+            bundle = await nexusmods.get_mod_bundle(MOCK_MOD_ID, include={"content_preview"})
+            assert bundle.mod is None
+            assert bundle.changelogs is None
+            assert bundle.files == [MOCK_PRIMARY_FILE]
+            assert bundle.content_preview == MOCK_CONTENT_PREVIEW
+            with pytest.raises(ValueError):
+                await nexusmods.get_mod_bundle(MOCK_MOD_ID, include={"readme"})
+
+
+@pytest.mark.asyncio
+async def test_mod_bundle_failure():  # type: ignore
+    async def slow(url, **kwargs):  # type: ignore
+        await asyncio.sleep(10)
+
+    mod_url = f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}/mods/{MOCK_MOD_ID}"
+    with aioresponses() as mock:
+        mock.get(f"{mod_url}.json", status=500)
+        mock.get(f"{mod_url}/changelogs.json", callback=slow)
+        async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME) as nexusmods:
+            with pytest.raises(ClientResponseError):
+                await asyncio.wait_for(nexusmods.get_mod_bundle(MOCK_MOD_ID, {"mod", "changelogs"}), timeout=5)
+            # the slow request was cancelled rather than left running
+            assert asyncio.all_tasks() == {asyncio.current_task()}
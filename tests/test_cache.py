@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+from aiohttp import ClientResponseError
+from aionexusmods import Md5Cache, ModCache, NexusMods
+from aioresponses import aioresponses
+
+from .mock_data import *
+
+MOCK_UNKNOWN_MD5_HASH = "00000000000000000000000000000000"
+
+
+@pytest.mark.asyncio
+async def test_md5_cache(mock_responses, tmp_path):  # type: ignore
+    cache = Md5Cache(tmp_path / "md5.sqlite")
+    async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME, md5_cache=cache) as nexusmods:
+        # the mocked response is only served once, so repeats must come from the cache
+        assert await nexusmods.get_md5_search(MOCK_MD5_HASH) == [(MOCK_MOD, MOCK_FILE)]
+        assert await nexusmods.get_md5_search(MOCK_MD5_HASH.upper()) == [(MOCK_MOD, MOCK_FILE)]
+    cache.close()
+
+    cache = Md5Cache(tmp_path / "md5.sqlite")
+    async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME, md5_cache=cache) as nexusmods:
+        assert await nexusmods.get_md5_search(MOCK_MD5_HASH) == [(MOCK_MOD, MOCK_FILE)]
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_md5_cache_negative(mock_responses, tmp_path):  # type: ignore
+    url = f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}/mods/md5_search/{MOCK_UNKNOWN_MD5_HASH}.json"
+    mock_responses.get(url, status=404)
+    cache = Md5Cache(tmp_path / "md5.sqlite")
+    async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME, md5_cache=cache) as nexusmods:
+        assert await nexusmods.get_md5_search(MOCK_UNKNOWN_MD5_HASH) == []
+        assert await nexusmods.get_md5_search(MOCK_UNKNOWN_MD5_HASH) == []
+        cache.negative_ttl = -1
+        mock_responses.get(url, status=404)
+        assert await nexusmods.get_md5_search(MOCK_UNKNOWN_MD5_HASH) == []
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_md5_search_unknown_without_cache(mock_responses):  # type: ignore
+    url = f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}/mods/md5_search/{MOCK_UNKNOWN_MD5_HASH}.json"
+    mock_responses.get(url, status=404)
+    async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME) as nexusmods:
+        assert await nexusmods.get_md5_search(MOCK_UNKNOWN_MD5_HASH) == []
+
+
+@pytest.mark.asyncio
+async def test_md5_search_many(mock_responses, tmp_path):  # type: ignore
+    url = f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}/mods/md5_search/{MOCK_UNKNOWN_MD5_HASH}.json"
+    mock_responses.get(url, status=404)
+    cache = Md5Cache(tmp_path / "md5.sqlite")
+    async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME, md5_cache=cache) as nexusmods:
+        hashes = [MOCK_MD5_HASH, MOCK_UNKNOWN_MD5_HASH, MOCK_MD5_HASH.upper(), MOCK_MD5_HASH]
+        assert await nexusmods.get_md5_search_many(hashes) == {
+            MOCK_MD5_HASH: [(MOCK_MOD, MOCK_FILE)],
+            MOCK_UNKNOWN_MD5_HASH: [],
+        }
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_md5_search_many_failure():  # type: ignore
+    async def slow(url, **kwargs):  # type: ignore
+        await asyncio.sleep(10)
+
+    md5_search_url = f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}/mods/md5_search"
+    with aioresponses() as mock:
+        mock.get(f"{md5_search_url}/{MOCK_MD5_HASH}.json", callback=slow)
+        mock.get(f"{md5_search_url}/{MOCK_UNKNOWN_MD5_HASH}.json", status=500)
+        async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME) as nexusmods:
+            with pytest.raises(ClientResponseError):
+                hashes = [MOCK_MD5_HASH, MOCK_UNKNOWN_MD5_HASH]
+                await asyncio.wait_for(nexusmods.get_md5_search_many(hashes), timeout=5)
+            # the slow search was cancelled rather than left running
+            assert asyncio.all_tasks() == {asyncio.current_task()}
+
+
+@pytest.mark.asyncio
+async def test_mod_cache(mock_responses, tmp_path):  # type: ignore
+    changelogs_url = f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}/mods/{MOCK_MOD_ID}/changelogs.json"
+    cache = ModCache(tmp_path / "mods.sqlite")
+    async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME, mod_cache=cache) as nexusmods:
+        # the mocked responses are only served once, so repeats must come from the cache
+        assert await nexusmods.get_mod_changelogs(MOCK_MOD_ID, MOCK_MOD) == MOCK_CHANGELOGS
+        assert await nexusmods.get_mod_changelogs(MOCK_MOD_ID, MOCK_MOD) == MOCK_CHANGELOGS
+        assert await nexusmods.get_mod_changelogs(MOCK_MOD_ID, MOCK_MOD_UPDATE) == MOCK_CHANGELOGS
+        files = ([MOCK_FILE], [MOCK_FILE_UPDATE])
+        assert await nexusmods.get_files_and_updates(MOCK_MOD_ID, MOCK_MOD_UPDATE) == files
+        assert await nexusmods.get_files_and_updates(MOCK_MOD_ID, MOCK_MOD) == files
+
+        # a new version or a newer update is fetched again
+        mock_responses.get(changelogs_url, payload={})
+        assert await nexusmods.get_mod_changelogs(MOCK_MOD_ID, MOCK_MOD.copy(update={"version": "0.2.0"})) == {}
+        mock_responses.get(changelogs_url, payload=MOCK_CHANGELOGS)
+        newer = MOCK_MOD_UPDATE.copy(update={"latest_mod_activity": MOCK_MOD_UPDATE.latest_mod_activity + 1})
+        assert await nexusmods.get_mod_changelogs(MOCK_MOD_ID, newer) == MOCK_CHANGELOGS
+
+        with pytest.raises(ValueError):
+            await nexusmods.get_mod_changelogs(MOCK_MOD_ID + 1, MOCK_MOD)
+    cache.close()
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+from aiohttp import ClientResponseError, ServerDisconnectedError
+from aionexusmods import CatalogCrawler, NexusMods
+from aioresponses import aioresponses
+
+from .mock_data import *
+
+
+def mock_mod(mock, mod_id, **kwargs):  # type: ignore
+    url = f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}/mods/{mod_id}.json"
+    mod = MOCK_MOD.copy(update={"mod_id": mod_id, **kwargs})
+    mock.get(url, payload=mod.dict())
+    return mod
+
+
+@pytest.mark.asyncio
+async def test_crawler(tmp_path):  # type: ignore
+    crawled = []
+
+    async def sink(mod):  # type: ignore
+        crawled.append(mod.mod_id)
+
+    with aioresponses() as mock:
+        async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME) as nexusmods:
+            crawler = CatalogCrawler(nexusmods, tmp_path / "crawl.sqlite", sink, workers=1, shard_size=2)
+
+            mock_mod(mock, 1)
+            mock.get(f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}/mods/2.json", status=404)
+            mock_mod(mock, 3, available=False, status="hidden")
+            mock_mod(mock, 4)
+            mock.get(f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}/mods/5.json", status=400)
+            with pytest.raises(ClientResponseError):
+                await crawler.run(stop=6)
+            assert crawled == [1, 4]
+            assert crawler.gaps == {2: "http 404", 3: "hidden"}
+
+            # resumes from the checkpoint, crawling up to the newest added mod
+            mock.get(
+                f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}/mods/latest_added.json",
+                payload=[MOCK_MOD.copy(update={"mod_id": 6}).dict()],
+            )
+            mock_mod(mock, 5)
+            mock_mod(mock, 6)
+            await crawler.run()
+            assert crawled == [1, 4, 5, 6]
+
+            # known gaps are skipped after a reset
+            crawler.reset()
+            for mod_id in (1, 4, 5, 6):
+                mock_mod(mock, mod_id)
+            await crawler.run(stop=7)
+            assert crawled == [1, 4, 5, 6, 1, 4, 5, 6]
+            crawler.close()
+
+
+@pytest.mark.asyncio
+async def test_crawler_without_mods(tmp_path):  # type: ignore
+    async def sink(mod):  # type: ignore
+        raise AssertionError(mod)
+
+    with aioresponses() as mock:
+        mock.get(f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}/mods/latest_added.json", payload=[])
+        async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME) as nexusmods:
+            crawler = CatalogCrawler(nexusmods, tmp_path / "crawl.sqlite", sink)
+            await crawler.run()
+            assert crawler.gaps == {}
+            crawler.close()
+
+
+@pytest.mark.asyncio
+async def test_crawler_awaits_workers(tmp_path):  # type: ignore
+    cancelled = []
+
+    async def sink(mod):  # type: ignore
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(mod.mod_id)
+            raise
+
+    with aioresponses() as mock:
+        async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME) as nexusmods:
+            crawler = CatalogCrawler(nexusmods, tmp_path / "crawl.sqlite", sink, workers=2)
+            mock_mod(mock, 1)
+            mock.get(f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}/mods/2.json", status=400)
+            with pytest.raises(ClientResponseError):
+                await crawler.run(stop=3)
+            # the worker stuck in the sink was cancelled and awaited before run() raised
+            assert cancelled == [1]
+            crawler.close()
+
+
+@pytest.mark.asyncio
+async def test_crawler_retries_connection_errors(tmp_path):  # type: ignore
+    crawled = []
+
+    async def sink(mod):  # type: ignore
+        crawled.append(mod.mod_id)
+
+    with aioresponses() as mock:
+        async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME) as nexusmods:
+            crawler = CatalogCrawler(nexusmods, tmp_path / "crawl.sqlite", sink, workers=2)
+            mock.get(f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}/mods/1.json", exception=ServerDisconnectedError())
+            mock.get(f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}/mods/2.json", exception=asyncio.TimeoutError())
+            mock_mod(mock, 1)
+            mock_mod(mock, 2)
+            await crawler.run(stop=3)
+            assert sorted(crawled) == [1, 2]
+            crawler.close()
@@ -0,0 +1,50 @@
+import pytest
+from aiohttp import ClientResponseError
+from aionexusmods import NexusMods
+
+from .mock_data import *
+
+
+@pytest.mark.asyncio
+async def test_mod_updates_for_all_games(mock_responses):  # type: ignore
+    async with NexusMods(MOCK_API_KEY, "skyrim") as nexusmods:
+        updates = [item async for item in nexusmods.get_mod_updates_for_games("1d")]
+        assert updates == [(MOCK_GAME_DOMAIN_NAME, MOCK_MOD_UPDATE)]
+        assert nexusmods.game_domain_name == "skyrim"
+
+
+@pytest.mark.asyncio
+async def test_latest_updated_mods_for_games(mock_responses):  # type: ignore
+    skyrim_mod = MOCK_MOD.copy(update={"domain_name": "skyrim"})
+    mock_responses.get(f"{MOCK_BASE_URL}/games/skyrim/mods/latest_updated.json", payload=[skyrim_mod.dict()])
+    async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME) as nexusmods:
+        game_domain_names = ["skyrim", MOCK_GAME_DOMAIN_NAME, "skyrim"]
+        mods = [item async for item in nexusmods.get_latest_updated_mods_for_games(game_domain_names, concurrency=1)]
+        assert sorted(mods) == [(MOCK_GAME_DOMAIN_NAME, MOCK_MOD), ("skyrim", skyrim_mod)]
+
+
+@pytest.mark.asyncio
+async def test_mod_updates_for_games_on_error(mock_responses):  # type: ignore
+    mock_responses.get(f"{MOCK_BASE_URL}/games/skyrim/mods/updated.json", status=404)
+    errors = []
+    async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME) as nexusmods:
+        game_domain_names = ["skyrim", MOCK_GAME_DOMAIN_NAME]
+        updates = [
+            item
+            async for item in nexusmods.get_mod_updates_for_games(
+                "1d", game_domain_names, on_error=lambda name, e: errors.append((name, e))
+            )
+        ]
+        assert updates == [(MOCK_GAME_DOMAIN_NAME, MOCK_MOD_UPDATE)]
+        assert [(name, type(e)) for name, e in errors] == [("skyrim", ClientResponseError)]
+
+
+@pytest.mark.asyncio
+async def test_mod_updates_for_games_raises_after_other_games(mock_responses):  # type: ignore
+    mock_responses.get(f"{MOCK_BASE_URL}/games/skyrim/mods/updated.json", status=404)
+    updates = []
+    async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME) as nexusmods:
+        with pytest.raises(ClientResponseError):
+            async for item in nexusmods.get_mod_updates_for_games("1d", ["skyrim", MOCK_GAME_DOMAIN_NAME]):
+                updates.append(item)
+        assert updates == [(MOCK_GAME_DOMAIN_NAME, MOCK_MOD_UPDATE)]
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from aionexusmods import HedgePolicy, NexusMods
+from aioresponses import CallbackResult, aioresponses
+
+from .mock_data import *
+
+MOCK_MOD_URL = f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}/mods/{MOCK_MOD_ID}.json"
+
+
+def first_response_slow():  # type: ignore
+    calls = 0
+
+    async def callback(url, **kwargs):  # type: ignore
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(10)
+        return CallbackResult(payload=MOCK_MOD.dict())
+
+    return callback
+
+
+def test_hedge_policy() -> None:
+    policy = HedgePolicy(percentile=0.5, min_samples=3, default_delay=1.0, min_delay=0.0, budget=0.5, burst=1)
+    assert policy.endpoint(MOCK_MOD_URL) == "api.nexusmods.com/v1/games/{game}/mods/{id}.json"
+    assert (
+        policy.endpoint(f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}.json")
+        == "api.nexusmods.com/v1/games/{game}.json"
+    )
+    assert policy.endpoint(f"{MOCK_BASE_URL}/games.json") == "api.nexusmods.com/v1/games.json"
+    assert (
+        policy.endpoint(f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}/mods/latest_added.json")
+        == "api.nexusmods.com/v1/games/{game}/mods/latest_added.json"
+    )
+    assert (
+        policy.endpoint(f"{MOCK_BASE_URL}/mods/md5_search/{MOCK_MD5_HASH}.json")
+        == "api.nexusmods.com/v1/mods/md5_search/{id}.json"
+    )
+    # content previews are grouped rather than tracked per file
+    assert (
+        policy.endpoint(MOCK_FILE.content_preview_link)
+        == policy.endpoint(MOCK_FILE.content_preview_link.replace("0-1-0", "0-2-0"))
+        == "file-metadata.nexusmods.com/file/nexus-files-s3-meta/{id}/{id}/{name}"
+    )
+
+    endpoint = policy.endpoint(MOCK_MOD_URL)
+    assert policy.delay(endpoint) == 1.0
+    for latency in (0.3, 0.1, 0.2):
+        policy.record(endpoint, latency)
+    assert policy.delay(endpoint) == 0.2
+
+    assert not policy.try_hedge()
+    for _ in range(4):
+        policy.on_request()
+    assert policy.try_hedge()
+    assert not policy.try_hedge()
+
+
+def test_hedge_policy_max_endpoints() -> None:
+    policy = HedgePolicy(percentile=0.5, min_samples=1, max_endpoints=2)
+    policy.record("a", 0.1)
+    policy.record("b", 0.2)
+    policy.record("a", 0.1)
+    policy.record("c", 0.3)
+    assert policy.delay("a") == 0.1
+    assert policy.delay("b") == policy.default_delay
+    assert policy.delay("c") == 0.3
+
+
+@pytest.mark.asyncio
+async def test_hedged_get():  # type: ignore
+    policy = HedgePolicy(default_delay=0.05, budget=1.0)
+    with aioresponses() as mock:
+        mock.get(MOCK_MOD_URL, callback=first_response_slow(), repeat=True)
+        async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME, hedge_policy=policy) as nexusmods:
+            assert await nexusmods.get_mod(MOCK_MOD_ID) == MOCK_MOD
+            # the slow request was cancelled and awaited rather than left pending
+            assert asyncio.all_tasks() == {asyncio.current_task()}
+    assert not policy.try_hedge()
+
+
+@pytest.mark.asyncio
+async def test_hedged_get_without_budget():  # type: ignore
+    policy = HedgePolicy(default_delay=0.05, budget=0.0)
+    with aioresponses() as mock:
+        mock.get(MOCK_MOD_URL, callback=first_response_slow(), repeat=True)
+        async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME, hedge_policy=policy) as nexusmods:
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(nexusmods.get_mod(MOCK_MOD_ID), timeout=0.2)
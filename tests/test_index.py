@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+from aiohttp import ClientResponseError
+from aionexusmods import ContentIndex, NexusMods
+from aionexusmods.models import ContentPreview
+from aioresponses import aioresponses
+
+from .mock_data import *
+
+MOCK_CONTENT_PREVIEW = ContentPreview(
+    path=None,
+    name="Nexus Mods API Test-49565-0-1-0-1618582484.zip",
+    type="directory",
+    children=[
+        ContentPreview(
+            path="Data Files",
+            name="Data Files",
+            type="directory",
+            children=[
+                ContentPreview(path="Data Files\\Meshes\\foo.nif", name="foo.nif", type="file", size="2 kB"),
+                ContentPreview(path="Data Files\\Meshes\\bar.nif", name="bar.nif", type="file", size="3 kB"),
+            ],
+        ),
+        ContentPreview(path="readme.txt", name="readme.txt", type="file", size="1 kB"),
+    ],
+)
+
+MOCK_NEW_FILE = MOCK_FILE.copy(
+    update={
+        "file_id": MOCK_FILE_ID + 2,
+        "content_preview_link": MOCK_FILE.content_preview_link.replace("0-1-0", "0-2-0"),
+    }
+)
+
+FILES_URL = f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}/mods/{MOCK_MOD_ID}/files.json"
+
+
+@pytest.mark.asyncio
+async def test_content_index(tmp_path):  # type: ignore
+    index = ContentIndex(tmp_path / "index.sqlite")
+    with aioresponses() as mock:
+        mock.get(FILES_URL, payload=MOCK_FILES_RESULT.dict())
+        mock.get(MOCK_FILE.content_preview_link, payload=MOCK_CONTENT_PREVIEW.dict())
+        async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME) as nexusmods:
+            await index.update(nexusmods, [MOCK_MOD_ID])
+
+            assert [e.file_id for e in index.find("meshes/FOO.nif")] == [MOCK_FILE_ID]
+            assert [e.path for e in index.find_prefix("data files/meshes/")] == [
+                "data files/meshes/bar.nif",
+                "data files/meshes/foo.nif",
+            ]
+            assert index.find_name("readme.txt")[0].size == "1 kB"
+            assert index.find("eshes/foo.nif") == []
+
+            # unchanged files are not previewed again, their preview is no longer mocked
+            mock.get(FILES_URL, payload=FilesResult(files=[MOCK_FILE, MOCK_NEW_FILE], file_updates=[]).dict())
+            mock.get(MOCK_NEW_FILE.content_preview_link, status=404)
+            await index.update(nexusmods, [MOCK_MOD_ID])
+            assert [e.file_id for e in index.find_name("readme.txt")] == [MOCK_FILE_ID]
+
+            # removed files are dropped
+            mock.get(FILES_URL, payload=FilesResult(files=[MOCK_NEW_FILE], file_updates=[]).dict())
+            await index.update(nexusmods, [MOCK_MOD_ID])
+            assert index.find_name("readme.txt") == []
+
+        async with NexusMods(MOCK_API_KEY, "skyrim") as nexusmods:
+            with pytest.raises(ValueError):
+                await index.update(nexusmods, [MOCK_MOD_ID])
+    index.close()
+
+
+@pytest.mark.asyncio
+async def test_content_index_failure(tmp_path):  # type: ignore
+    async def slow(url, **kwargs):  # type: ignore
+        await asyncio.sleep(10)
+
+    index = ContentIndex(tmp_path / "index.sqlite")
+    with aioresponses() as mock:
+        mock.get(FILES_URL, status=500)
+        mock.get(FILES_URL.replace(str(MOCK_MOD_ID), str(MOCK_MOD_ID + 1)), callback=slow)
+        async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME) as nexusmods:
+            with pytest.raises(ClientResponseError):
+                await asyncio.wait_for(index.update(nexusmods, [MOCK_MOD_ID, MOCK_MOD_ID + 1]), timeout=5)
+            # the slow mod was cancelled rather than left running
+            assert asyncio.all_tasks() == {asyncio.current_task()}
+    index.close()
@@ -0,0 +1,73 @@
+import pickle
+from typing import cast
+
+import pytest
+from aionexusmods import LazyModel, ModCache, NexusMods
+from aionexusmods.models import Mod, ModUser
+from aioresponses import aioresponses
+from pydantic import ValidationError
+
+from .mock_data import *
+
+
+@pytest.mark.asyncio
+async def test_lazy(mock_responses):  # type: ignore
+    async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME, lazy=True) as nexusmods:
+        mod = await nexusmods.get_mod(MOCK_MOD_ID)
+        assert isinstance(mod, Mod) and issubclass(type(mod), LazyModel)
+        assert type(mod).__name__ == "LazyMod"
+        assert mod == MOCK_MOD
+        assert mod.dict() == MOCK_MOD.dict()
+        assert mod.json() == MOCK_MOD.json()
+        assert mod.copy() == MOCK_MOD
+        assert mod.__fields_set__ == MOCK_MOD.__fields_set__
+        # pickled as the fully validated model
+        unpickled = pickle.loads(pickle.dumps(mod))
+        assert type(unpickled) is Mod and unpickled == MOCK_MOD
+        assert await nexusmods.get_latest_added_mods() == [MOCK_MOD]
+        assert await nexusmods.get_md5_search(MOCK_MD5_HASH) == [(MOCK_MOD, MOCK_FILE)]
+        assert await nexusmods.get_files_and_updates(MOCK_MOD_ID) == ([MOCK_FILE], [MOCK_FILE_UPDATE])
+        assert await nexusmods.get_mod_changelogs(MOCK_MOD_ID) == MOCK_CHANGELOGS
+
+
+@pytest.mark.asyncio
+async def test_lazy_fields():  # type: ignore
+    raw = MOCK_MOD.dict()
+    raw["description"] = ["not", "a", "string"]
+    raw["mod_id"] = str(MOCK_MOD_ID)
+    with aioresponses() as mock:
+        mock.get(f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}/mods/{MOCK_MOD_ID}.json", payload=raw)
+        async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME, lazy=True) as nexusmods:
+            mod = await nexusmods.get_mod(MOCK_MOD_ID)
+    # fields are only validated when they are accessed
+    assert mod.mod_id == MOCK_MOD_ID
+    assert mod.user == MOCK_MOD_USER
+    assert isinstance(mod.user, ModUser) and type(mod.user).__name__ == "LazyModUser"
+    assert "description" not in repr(mod)
+    with pytest.raises(ValidationError):
+        mod.description
+    with pytest.raises(ValidationError):
+        cast(LazyModel, mod).validate_all()
+    with pytest.raises(ValidationError):
+        mod.dict()
+    # a failed validation leaves the model lazy
+    assert "description" not in repr(mod)
+
+
+@pytest.mark.asyncio
+async def test_lazy_mod_cache(mock_responses, tmp_path):  # type: ignore
+    raw = MOCK_MOD.dict()
+    raw["description"] = ["not", "a", "string"]
+    mock_responses.get(f"{MOCK_BASE_URL}/games/{MOCK_GAME_DOMAIN_NAME}/mods/{MOCK_MOD_ID}.json", payload=raw)
+    cache = ModCache(tmp_path / "mods.sqlite")
+    async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME, lazy=True, mod_cache=cache) as nexusmods:
+        mod = await nexusmods.get_mod(MOCK_MOD_ID)
+        (mod_update,) = await nexusmods.get_mod_updates("1d")
+        # the mocked changelogs are only served once, so repeats must come from the cache
+        assert await nexusmods.get_mod_changelogs(MOCK_MOD_ID, mod) == MOCK_CHANGELOGS
+        assert await nexusmods.get_mod_changelogs(MOCK_MOD_ID, mod) == MOCK_CHANGELOGS
+        assert await nexusmods.get_mod_changelogs(MOCK_MOD_ID, mod_update) == MOCK_CHANGELOGS
+    # only the fields needed for the cache were validated
+    assert "description" not in repr(mod)
+    assert "updated_timestamp" in repr(mod)
+    cache.close()
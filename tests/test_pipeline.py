@@ -0,0 +1,185 @@
+import hashlib
+import io
+import os
+import zipfile
+
+import pytest
+from aionexusmods import DownloadStage, Md5Stage, NexusMods, ZipExtractStage, pipeline
+from aioresponses import aioresponses
+
+from .mock_data import *
+
+MOCK_ARCHIVE_FILES = {
+    "readme.txt": b"Nexus Mods API Test",
+    "Data Files/meshes/foo.nif": bytes(range(256)) * 64,
+    "Data Files/textures/empty.dds": b"",
+}
+
+
+class UnseekableStream(io.RawIOBase):
+    def __init__(self) -> None:
+        self.data = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b):  # type: ignore
+        self.data += b
+        return len(b)
+
+
+def make_archive(compression: int, seekable: bool = True) -> bytes:
+    stream = io.BytesIO() if seekable else UnseekableStream()
+    with zipfile.ZipFile(stream, "w", compression) as archive:
+        archive.writestr("Data Files/", b"")
+        for name, data in MOCK_ARCHIVE_FILES.items():
+            archive.writestr(name, data)
+    return stream.getvalue() if seekable else bytes(stream.data)  # type: ignore
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2, zipfile.ZIP_LZMA])
+@pytest.mark.parametrize("seekable", [True, False])
+async def test_zip_extract_stage(tmp_path, compression, seekable):  # type: ignore
+    archive = make_archive(compression, seekable)
+    stage = ZipExtractStage(tmp_path)
+    for i in range(0, len(archive), 7):
+        await stage.feed(archive[i : i + 7])
+    await stage.close()
+    for name, data in MOCK_ARCHIVE_FILES.items():
+        assert (tmp_path / name).read_bytes() == data
+    assert (tmp_path / "Data Files").is_dir()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compression", [zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2, zipfile.ZIP_LZMA])
+async def test_zip_extract_stage_bounded_output(tmp_path, monkeypatch, compression):  # type: ignore
+    monkeypatch.setattr(pipeline, "_MAX_OUTPUT", 1024)
+    stream = io.BytesIO()
+    with zipfile.ZipFile(stream, "w", compression) as archive:
+        archive.writestr("zeros.bin", bytes(1024 * 1024))
+        archive.writestr("readme.txt", b"Nexus Mods API Test")
+    stage = ZipExtractStage(tmp_path)
+    writes = []
+    write = stage._write
+
+    async def spy(data):  # type: ignore
+        writes.append(len(data))
+        await write(data)
+
+    stage._write = spy  # type: ignore
+    await stage.feed(stream.getvalue())
+    await stage.close()
+    assert max(writes) <= 1024
+    assert (tmp_path / "zeros.bin").read_bytes() == bytes(1024 * 1024)
+    assert (tmp_path / "readme.txt").read_bytes() == b"Nexus Mods API Test"
+
+
+@pytest.mark.asyncio
+async def test_zip_extract_stage_truncated(tmp_path):  # type: ignore
+    archive = make_archive(zipfile.ZIP_DEFLATED)
+    stage = ZipExtractStage(tmp_path)
+    await stage.feed(archive[:100])
+    with pytest.raises(zipfile.BadZipFile):
+        await stage.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "name", ["C:/Windows/evil.dll", "C:Windows/evil.dll", "/Windows/evil.dll", "../Windows/evil.dll"]
+)
+async def test_zip_extract_stage_sanitizes_names(tmp_path, name):  # type: ignore
+    stream = io.BytesIO()
+    with zipfile.ZipFile(stream, "w") as archive:
+        archive.writestr(name, b"evil")
+    stage = ZipExtractStage(tmp_path / "extracted")
+    await stage.feed(stream.getvalue())
+    await stage.close()
+    assert stage.extracted == [str(tmp_path / "extracted" / "Windows" / "evil.dll")]
+    assert (tmp_path / "extracted" / "Windows" / "evil.dll").read_bytes() == b"evil"
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(os.name == "nt", reason="creating symlinks requires elevated privileges")
+async def test_zip_extract_stage_outside_directory(tmp_path):  # type: ignore
+    (tmp_path / "extracted").mkdir()
+    (tmp_path / "extracted" / "link").symlink_to(tmp_path)
+    stream = io.BytesIO()
+    with zipfile.ZipFile(stream, "w") as archive:
+        archive.writestr("link/evil.dll", b"evil")
+    stage = ZipExtractStage(tmp_path / "extracted")
+    with pytest.raises(zipfile.BadZipFile):
+        await stage.feed(stream.getvalue())
+    assert not (tmp_path / "evil.dll").exists()
+
+
+@pytest.mark.asyncio
+async def test_zip_extract_stage_abort(tmp_path):  # type: ignore
+    archive = make_archive(zipfile.ZIP_STORED)
+    stage = ZipExtractStage(tmp_path)
+    await stage.feed(archive[:90])
+    assert (tmp_path / "readme.txt").exists()
+    await stage.abort()
+    assert list(tmp_path.iterdir()) == []
+    assert stage.extracted == []
+
+
+class FailingStage(DownloadStage):
+    def __init__(self) -> None:
+        self.aborted = False
+
+    async def feed(self, chunk: bytes) -> None:
+        raise RuntimeError("stage failed")
+
+    async def abort(self) -> None:
+        self.aborted = True
+
+
+class RecordingStage(DownloadStage):
+    def __init__(self) -> None:
+        self.closed = False
+        self.aborted = False
+
+    async def close(self) -> None:
+        self.closed = True
+
+    async def abort(self) -> None:
+        self.aborted = True
+
+
+@pytest.mark.asyncio
+async def test_download_stages_aborted(tmp_path):  # type: ignore
+    stage = FailingStage()
+    with aioresponses() as mock:
+        mock.get(MOCK_DOWNLOAD_LINK.URI, body=b"not a zip")
+        async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME) as nexusmods:
+            with pytest.raises(RuntimeError):
+                await nexusmods.download(MOCK_DOWNLOAD_LINK.URI, tmp_path / "archive.zip", stages=[stage])
+    assert stage.aborted
+
+
+@pytest.mark.asyncio
+async def test_download_stages(tmp_path):  # type: ignore
+    archive = make_archive(zipfile.ZIP_DEFLATED)
+    md5_stage = Md5Stage()
+    zip_stage = ZipExtractStage(tmp_path / "extracted")
+    with aioresponses() as mock:
+        mock.get(MOCK_DOWNLOAD_LINK.URI, body=archive)
+        async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME) as nexusmods:
+            await nexusmods.download(MOCK_DOWNLOAD_LINK.URI, tmp_path / "archive.zip", stages=[md5_stage, zip_stage])
+    assert (tmp_path / "archive.zip").read_bytes() == archive
+    assert md5_stage.hexdigest() == hashlib.md5(archive).hexdigest()
+    assert (tmp_path / "extracted" / "readme.txt").read_bytes() == MOCK_ARCHIVE_FILES["readme.txt"]
+
+
+@pytest.mark.asyncio
+async def test_download_stages_aborted_on_close(tmp_path):  # type: ignore
+    archive = make_archive(zipfile.ZIP_DEFLATED)
+    zip_stage = ZipExtractStage(tmp_path / "extracted")
+    stage = RecordingStage()
+    with aioresponses() as mock:
+        mock.get(MOCK_DOWNLOAD_LINK.URI, body=archive[:100])
+        async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME) as nexusmods:
+            with pytest.raises(zipfile.BadZipFile):
+                await nexusmods.download(MOCK_DOWNLOAD_LINK.URI, tmp_path / "archive.zip", stages=[zip_stage, stage])
+    assert stage.aborted and not stage.closed
@@ -0,0 +1,89 @@
+import hashlib
+import io
+import zipfile
+
+import pytest
+from aionexusmods import DownloadStore, Md5Stage, NexusMods, ZipExtractStage
+from aioresponses import aioresponses
+
+from .mock_data import *
+
+MOCK_DOWNLOAD_BODY = b"Nexus Mods API Test" * 1024
+
+MOCK_HASHED_FILE = MOCK_FILE.copy(update={"md5": hashlib.md5(MOCK_DOWNLOAD_BODY).hexdigest()})
+
+
+@pytest.mark.asyncio
+async def test_download_store(tmp_path):  # type: ignore
+    store = DownloadStore(tmp_path / "store", max_size=1024 * 1024)
+    first, second = tmp_path / "profile1" / MOCK_FILE.file_name, tmp_path / "profile2" / MOCK_FILE.file_name
+    md5_stage = Md5Stage()
+    with aioresponses() as mock:
+        # the download link is only served once, so the second download must come from the store
+        mock.get(MOCK_DOWNLOAD_LINK.URI, body=MOCK_DOWNLOAD_BODY)
+        async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME, download_store=store) as nexusmods:
+            await nexusmods.download(MOCK_DOWNLOAD_LINK.URI, first, file=MOCK_HASHED_FILE)
+            await nexusmods.download(MOCK_DOWNLOAD_LINK.URI, second, stages=[md5_stage], file=MOCK_HASHED_FILE)
+    assert first.read_bytes() == second.read_bytes() == MOCK_DOWNLOAD_BODY
+    assert md5_stage.hexdigest() == hashlib.md5(MOCK_DOWNLOAD_BODY).hexdigest()
+    assert store.refcount(DownloadStore.key(MOCK_HASHED_FILE)) == 2
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_download_store_md5_mismatch(tmp_path):  # type: ignore
+    store = DownloadStore(tmp_path / "store", max_size=1024 * 1024)
+    corrupt = MOCK_DOWNLOAD_BODY[:-1]
+    with aioresponses() as mock:
+        mock.get(MOCK_DOWNLOAD_LINK.URI, body=corrupt)
+        async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME, download_store=store) as nexusmods:
+            with pytest.raises(ValueError):
+                await nexusmods.download(MOCK_DOWNLOAD_LINK.URI, tmp_path / "profile", file=MOCK_HASHED_FILE)
+    key = DownloadStore.key(MOCK_HASHED_FILE)
+    assert key not in store
+    assert not (tmp_path / "store" / "objects" / f"{key}.part").exists()
+    assert not (tmp_path / "profile").exists()
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_download_store_md5_mismatch_aborts_stages(tmp_path):  # type: ignore
+    store = DownloadStore(tmp_path / "store", max_size=1024 * 1024)
+    stream = io.BytesIO()
+    with zipfile.ZipFile(stream, "w") as archive:
+        archive.writestr("Data Files/evil.txt", b"evil")
+    zip_stage = ZipExtractStage(tmp_path / "extracted")
+    with aioresponses() as mock:
+        mock.get(MOCK_DOWNLOAD_LINK.URI, body=stream.getvalue())
+        async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME, download_store=store) as nexusmods:
+            with pytest.raises(ValueError):
+                await nexusmods.download(
+                    MOCK_DOWNLOAD_LINK.URI, tmp_path / "profile", stages=[zip_stage], file=MOCK_HASHED_FILE
+                )
+    assert not (tmp_path / "extracted" / "Data Files").exists()
+    assert DownloadStore.key(MOCK_HASHED_FILE) not in store
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_download_store_eviction(tmp_path):  # type: ignore
+    store = DownloadStore(tmp_path / "store", max_size=10)
+    for key in ("a", "b", "c"):
+        (tmp_path / key).write_bytes(b"12345")
+        store.add(key, tmp_path / key)
+        await store.link(key, tmp_path / "links" / key)
+    assert store.size == 15
+
+    store.release(tmp_path / "links" / "b")
+    assert "b" not in store
+    assert "a" in store and "c" in store
+
+    # deleting a linked path without releasing it also drops the reference
+    (tmp_path / "links" / "a").unlink()
+    store.evict()
+    assert "a" in store
+    store.max_size = 5
+    store.evict()
+    assert "a" not in store
+    assert "c" in store
+    store.close()
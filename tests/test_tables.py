@@ -0,0 +1,38 @@
+from array import array
+
+import pytest
+from aionexusmods import ModUpdateTable, NexusMods
+
+from .mock_data import *
+
+
+def make_table(*rows: tuple[int, int, int]) -> ModUpdateTable:
+    mod_ids, file_updates, mod_activities = zip(*rows) if rows else ((), (), ())
+    return ModUpdateTable(array("q", mod_ids), array("q", file_updates), array("q", mod_activities))
+
+
+@pytest.mark.asyncio
+async def test_mod_updates_table(mock_responses):  # type: ignore
+    async with NexusMods(MOCK_API_KEY, MOCK_GAME_DOMAIN_NAME) as nexusmods:
+        table = await nexusmods.get_mod_updates_table("1d")
+        assert list(table) == [MOCK_MOD_UPDATE]
+        assert table.get(MOCK_MOD_ID) == MOCK_MOD_UPDATE
+        assert MOCK_MOD_ID in table
+        assert MOCK_MOD_ID + 1 not in table
+
+
+def test_mod_updates_table_changed_since() -> None:
+    table = make_table((3, 30, 35), (1, 10, 15), (2, 20, 25))
+    assert list(table.mod_ids) == [1, 2, 3]
+    assert list(table.changed_since(20)) == [2, 3]
+    assert list(table.changed_since(35)) == []
+
+
+def test_mod_updates_table_diff() -> None:
+    old = make_table((1, 10, 10), (2, 20, 20), (3, 30, 30))
+    new = make_table((2, 20, 20), (3, 30, 31), (4, 40, 40))
+    added, removed, changed = old.diff(new)
+    assert list(added) == [4]
+    assert list(removed) == [1]
+    assert list(changed) == [3]
+    assert [list(a) for a in make_table().diff(new)] == [[2, 3, 4], [], []]